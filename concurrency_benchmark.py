@@ -0,0 +1,90 @@
+"""Concurrency check for the Telegram bot's message handler.
+
+Points the bot at a local mock of the DeepSeek API (mock_deepseek.py) with a
+fixed latency, times one "orca" mention through handle_message, then `--chats`
+mentions from different chats at once. Because every DeepSeek call is awaited
+on the event loop, the whole batch should finish in about the time of one;
+exits non-zero when it takes more than `--max-ratio` times as long.
+
+Usage:
+    python concurrency_benchmark.py [--chats 20] [--latency 1.0] [--max-ratio 2.0]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from mock_deepseek import start_mock_server
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+def fake_update(chat_id, text):
+    return SimpleNamespace(
+        message=FakeMessage(text),
+        effective_user=SimpleNamespace(id=chat_id),
+        effective_chat=SimpleNamespace(id=chat_id)
+    )
+
+async def send(bot, chat_ids):
+    """Deliver one unique mention per chat concurrently; return (seconds, replies)."""
+    # Questions are unique so neither the cache nor local intents can answer them
+    updates = [fake_update(chat_id, f"hey orca, what do orcas think about wave {chat_id}?") for chat_id in chat_ids]
+    start = time.monotonic()
+    await asyncio.gather(*(bot.handle_message(update, None) for update in updates))
+    return time.monotonic() - start, [reply for update in updates for reply in update.message.replies]
+
+async def run(chats):
+    import telegram_bot
+    logging.disable(logging.INFO)
+    # Admit every chat at once so the handler, not admission control, is measured
+    telegram_bot.admission = telegram_bot.AdmissionController(
+        global_rate=chats, global_burst=chats + 1, concurrency=chats, max_pending=chats + 1
+    )
+    single, replies = await send(telegram_bot, [0])
+    batch, batch_replies = await send(telegram_bot, range(1, chats + 1))
+    return single, batch, replies + batch_replies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=1.0, help="mock upstream latency in seconds")
+    parser.add_argument('--max-ratio', type=float, default=2.0)
+    args = parser.parse_args()
+
+    mock = start_mock_server(latency=args.latency)
+    # The bot creates its DeepSeek client at import
+    os.environ.update(
+        DEEPSEEK_API_KEY=os.getenv('DEEPSEEK_API_KEY', 'benchmark'),
+        DEEPSEEK_BASE_URL=mock.base_url
+    )
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # Keep any state files the bot writes out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix='orca-bench-'))
+
+    single, batch, replies = asyncio.run(run(args.chats))
+    upstream = sum(1 for reply in replies if 'mock ocean' in reply)
+    ratio = batch / single if single else float('inf')
+
+    print(f"1 mention: {single:.2f}s")
+    print(f"{args.chats} concurrent mentions: {batch:.2f}s ({ratio:.2f}x one, "
+          f"{upstream}/{args.chats + 1} answered by the mock)")
+    if upstream != args.chats + 1:
+        print("FAIL: some mentions were not answered upstream")
+        return 1
+    if ratio > args.max_ratio:
+        print(f"FAIL: concurrent mentions took more than {args.max_ratio}x a single one")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Offload ratio and routing cost of the local intent router.
+
+Routes a hand-written sample of chat messages through orca_api.intent_router
+(arithmetic handler plus the greeting, links and fact intents), prints how
+many are answered locally and what a classification costs, and exits
+non-zero when any message is routed differently from the label it is listed
+with. The sample leans towards short trivial messages, so the offload ratio
+on real traffic will be lower.
+
+Usage:
+    python intent_benchmark.py [--number 50000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# orca_api builds its DeepSeek client at import; no request is made here
+os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+os.environ.setdefault('GREETING_POOL_SIZE', '0')
+from orca_api import intent_router
+
+# (message, expected route); None means it must go upstream
+SAMPLE = [
+    ("hi", 'greeting'), ("Hello!", 'greeting'), ("hey orca", 'greeting'), ("Hey Orca!!", 'greeting'),
+    ("gm", 'greeting'), ("good morning orca", 'greeting'), ("what's up", 'greeting'), ("orca", 'greeting'),
+    ("hi there", 'greeting'), ("hey", 'greeting'),
+    ("links", 'links'), ("what are your links?", 'links'), ("twitter", 'links'),
+    ("Where can I follow you?", 'links'), ("github please", 'links'), ("send me your telegram link", 'links'),
+    ("what's your twitter", 'links'), ("what is the twitter handle?", 'links'),
+    ("tell me a fact", 'fact'), ("fun fact", 'fact'), ("Give me a random orca fact please", 'fact'),
+    ("another fact", 'fact'), ("facts", 'fact'),
+    ("what is 2+2?", 'math'), ("12*12", 'math'), ("calculate 2**16", 'math'),
+    # Real questions, including ones that look like a trivial intent
+    ("How do orcas hunt seals?", None), ("hi, can you explain transformers?", None), ("What is DeepSeek?", None),
+    ("write me a poem about the sea", None), ("hello how are you doing today", None),
+    ("why is the ocean salty?", None), ("what's your opinion on AI safety?", None),
+    ("tell me a fact about black holes", None), ("thanks", None), ("history of the orchestra", None),
+    ("hiking tips?", None), ("show me the code for quicksort", None),
+    ("what is github", None), ("what is twitter", None), ("orca what is telegram", None),
+    ("call 555-1234", None), ("12/25/2024", None), ("3 +", None),
+]
+
+def route(message):
+    """Name of the intent or handler that answers a message locally, or None."""
+    for name, handler in intent_router.handlers.items():
+        if handler(message):
+            return name
+    return intent_router.classify(message)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=50000)
+    args = parser.parse_args()
+
+    misrouted = [(message, expected, route(message)) for message, expected in SAMPLE]
+    misrouted = [case for case in misrouted if case[1] != case[2]]
+    local = sum(1 for _, expected in SAMPLE if expected)
+    upstream_us = timeit.timeit(lambda: intent_router.classify("How do orcas hunt seals?"), number=args.number)
+    upstream_us = upstream_us / args.number * 1e6
+
+    print(f"{len(SAMPLE)} messages, {local} answered locally ({local / len(SAMPLE):.0%} offload ratio)")
+    print(f"classifying a message that goes upstream: {upstream_us:.1f} us")
+    for message, expected, got in misrouted:
+        print(f"FAIL: {message!r} routed to {got}, expected {expected}")
+    return 1 if misrouted else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Load benchmark for /generate-response against a mock DeepSeek upstream.
+
+Starts the mock API (mock_deepseek.py) with a fixed latency, serves the web
+interface in another subprocess (threaded Flask or the ASGI app under uvicorn), then
+sends `--requests` distinct messages with `--concurrency` in flight and
+reports throughput and latency percentiles. Messages are unique so the
+completion cache, coalescing and intent routing never short-circuit them.
+
+Usage:
+    python load_benchmark.py --server asgi --requests 500 --concurrency 200
+    python load_benchmark.py --server flask --requests 500 --concurrency 200
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SERVER_COMMANDS = {
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'orca_asgi:app', '--port', str(port), '--log-level', 'warning'],
+    'flask': lambda port: [sys.executable, '-m', 'flask', '--app', 'orca_api', 'run', '--port', str(port), '--with-threads'],
+}
+
+def start_mock(port, latency):
+    # Separate process so the mock's threads don't share a GIL with the load generator
+    return subprocess.Popen([sys.executable, 'mock_deepseek.py', '--port', str(port), '--latency', str(latency)],
+                            cwd=ROOT, stdout=subprocess.DEVNULL)
+
+def start_server(kind, port, base_url):
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        DEEPSEEK_API_KEY=os.getenv('DEEPSEEK_API_KEY', 'benchmark'),
+        DEEPSEEK_BASE_URL=base_url,
+        GREETING_POOL_SIZE='0'
+    )
+    return subprocess.Popen(SERVER_COMMANDS[kind](port), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/get-greeting")
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+def run_load(url, requests, concurrency):
+    # Plain threads with one connection each keep the load generator itself
+    # from becoming the bottleneck on small machines
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'http'):
+            local.http = httpx.Client(timeout=120)
+        start = time.monotonic()
+        try:
+            response = local.http.post(f"{url}/generate-response", json={'message': f"benchmark question {i}"})
+            ok = response.status_code == 200 and response.json().get('status') == 'success'
+        except httpx.HTTPError:
+            ok = False
+        return time.monotonic() - start, ok
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.monotonic() - start
+
+    return elapsed, sorted(latency for latency, _ in results), sum(1 for _, ok in results if not ok)
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='asgi')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=1.0, help="mock upstream latency in seconds")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--mock-port', type=int, default=8090)
+    args = parser.parse_args()
+
+    mock = start_mock(args.mock_port, args.latency)
+    server = start_server(args.server, args.port, f"http://127.0.0.1:{args.mock_port}/v1")
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_ready(url)
+        elapsed, latencies, errors = run_load(url, args.requests, args.concurrency)
+    finally:
+        for process in (server, mock):
+            process.terminate()
+            process.wait()
+
+    print(f"{args.server}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"upstream latency {args.latency:.2f}s")
+    print(f"  {elapsed:.2f}s total, {args.requests / elapsed:.1f} req/s, {errors} errors")
+    print(f"  latency p50 {statistics.median(latencies):.3f}s, p95 {percentile(latencies, 0.95):.3f}s, "
+          f"p99 {percentile(latencies, 0.99):.3f}s")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Local stand-in for the DeepSeek chat completions API, used by the benchmarks.
+
+Answers POST .../chat/completions after a fixed latency, in either the plain
+JSON or the streaming (SSE) format. With trickle=True it behaves like a busy
+upstream: it sends the response headers, then a blank keep-alive line every
+half second until the latency has passed.
+
+Usage:
+    python mock_deepseek.py [--port 8090] [--latency 0.5] [--trickle]
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8090/v1 python telegram_bot.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "*click* *click* Making waves from the mock ocean!"
+
+def completion_body(content, model):
+    return {
+        "id": "mock-completion",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content}
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+def chunk_body(content, model, finish_reason=None):
+    return {
+        "id": "mock-completion",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}]
+    }
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        with self.server.lock:
+            self.server.requests += 1
+        model = request.get('model', 'deepseek-chat')
+
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        if self.server.trickle:
+            # Headers first, then keep-alive blank lines while "busy"
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            deadline = time.monotonic() + self.server.latency
+            try:
+                while time.monotonic() < deadline:
+                    self.write_chunk(b"\n")
+                    time.sleep(0.5)
+                self.write_chunk(json.dumps(completion_body(REPLY, model)).encode())
+                self.write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up at its deadline
+                self.close_connection = True
+            return
+
+        time.sleep(self.server.latency)
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for word in REPLY.split(" "):
+                self.write_chunk(f"data: {json.dumps(chunk_body(word + ' ', model))}\n\n".encode())
+            self.write_chunk(f"data: {json.dumps(chunk_body(None, model, 'stop'))}\n\n".encode())
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+            return
+
+        body = json.dumps(completion_body(REPLY, model)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+class MockDeepSeekServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=0.5, trickle=False, host='127.0.0.1'):
+        super().__init__((host, port), MockHandler)
+        self.latency = latency
+        self.trickle = trickle
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.base_url = f"http://{host}:{self.server_address[1]}/v1"
+
+def start_mock_server(port=0, latency=0.5, trickle=False):
+    """Serve the mock API from a daemon thread and return the server (see .base_url)."""
+    server = MockDeepSeekServer(port, latency, trickle)
+    threading.Thread(target=server.serve_forever, name="mock-deepseek", daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--trickle', action='store_true')
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(args.port, args.latency, args.trickle)
+    print(f"Mock DeepSeek API at {server.base_url} (latency {args.latency}s)")
+    server.serve_forever()
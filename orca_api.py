@@ -1,12 +1,23 @@
+import ast
+import json
 import logging
+import math
+import operator
 import os
 import re
 import random
+import threading
 import time
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from functools import lru_cache
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, stream_with_context
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
+from orca_cache import create_cache_from_env, make_namespace
+from orca_intents import IntentRouter, default_intents
+from orca_llm import DEADLINES, CircuitOpenError, create_completion
+from orca_memory import create_context_builder_from_env
+from orca_metrics import metrics
 
 # Load environment variables
 load_dotenv()
@@ -17,7 +28,7 @@ app = Flask(__name__)
 # Initialize OpenAI client with DeepSeek configuration
 client = OpenAI(
     api_key=os.getenv('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com"
+    base_url=os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com")
 )
 
 class OrcaPersonality:
@@ -60,6 +71,163 @@ Key traits:
 # Initialize Orca personality
 orca = OrcaPersonality()
 
+# Completion settings shared by the Flask routes and the ASGI front end
+RESPONSE_PARAMS = {"model": "deepseek-chat", "temperature": 0.9, "max_tokens": 250}
+GREETING_PARAMS = {"model": "deepseek-chat", "temperature": 0.9, "max_tokens": 50}
+GREETING_REQUEST = "Generate a friendly whale-themed greeting"
+ERROR_RESPONSE = "*click* *click* Oops, hit some rough waters! Let me try again..."
+
+fallback_greetings = [
+    "*click* *click* Hello! Ready to make waves in the data ocean?",
+    "Greetings from the deep! Let's dive into some problem-solving!",
+    "*Whale song* Welcome! My DeepSeek-powered brain is ready to help!",
+    "Surfacing to say hello! What shall we explore today?",
+    "*click* Ready to swim through some data together?"
+]
+
+# Repeated prompts are answered from the completion cache without a DeepSeek call
+completion_cache = create_cache_from_env()
+RESPONSE_NAMESPACE = make_namespace(orca.system_prompt, **RESPONSE_PARAMS)
+
+# Fits conversation history into ORCA_CONTEXT_BUDGET prompt tokens
+context_builder = create_context_builder_from_env()
+
+def build_messages(user_message):
+    """Build the chat messages for a single web interface request."""
+    return [
+        {"role": "system", "content": orca.system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+class GreetingPool:
+    """Pool of pre-generated greetings kept topped up by a background thread."""
+    def __init__(self, target_size=20, ttl=3600, idle_interval=5, error_backoff=30):
+        self.target_size = target_size
+        self.ttl = ttl
+        self.idle_interval = idle_interval
+        self.error_backoff = error_backoff
+        self.greetings = []  # [greeting, created_at] pairs
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """Start the refill thread once per process."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.refill_loop, name="greeting-pool", daemon=True)
+                self.thread.start()
+
+    def generate_greeting(self):
+        response = create_completion(
+            client,
+            deadline=DEADLINES['background'],
+            messages=build_messages(GREETING_REQUEST),
+            **GREETING_PARAMS
+        )
+        return response.choices[0].message.content.strip()
+
+    def refill_loop(self):
+        """Fill the pool to its target size, then replace entries past their TTL."""
+        while True:
+            with self.lock:
+                size = len(self.greetings)
+                oldest = min(range(size), key=lambda i: self.greetings[i][1]) if size else None
+                stale = oldest is not None and time.time() - self.greetings[oldest][1] > self.ttl
+
+            if size >= self.target_size and not stale:
+                time.sleep(self.idle_interval)
+                continue
+
+            try:
+                greeting = self.generate_greeting()
+            except Exception as e:
+                logging.error(f"Greeting Pool Error: {e}")
+                time.sleep(self.error_backoff)
+                continue
+
+            with self.lock:
+                if len(self.greetings) < self.target_size:
+                    self.greetings.append([greeting, time.time()])
+                else:
+                    # Stale entries keep being served until their replacement is ready
+                    self.greetings[oldest] = [greeting, time.time()]
+
+    def get(self):
+        """Return (greeting, pooled) without ever calling upstream."""
+        self.start()
+        with self.lock:
+            if self.greetings:
+                return random.choice(self.greetings)[0], True
+        return random.choice(fallback_greetings), False
+
+greeting_pool = GreetingPool(
+    target_size=int(os.getenv('GREETING_POOL_SIZE', 20)),
+    ttl=int(os.getenv('GREETING_TTL', 3600))
+)
+
+metrics.gauge('completion_cache', completion_cache.stats)
+metrics.gauge('greeting_pool_depth', lambda: len(greeting_pool.greetings))
+
+# Limits for the local arithmetic evaluator
+MAX_EXPRESSION_LENGTH = 120
+# Every tree level takes at least one character, so anything within the length
+# cap passes; the depth check only guards recursion if that cap is raised.
+# Runaway cost is bounded by the exponent and result caps
+MAX_EXPRESSION_DEPTH = MAX_EXPRESSION_LENGTH
+MAX_EXPONENT = 128
+MAX_RESULT = 1e100
+
+MATH_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+MATH_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+# "what is 12 * (3 + 4)?", "calculate 2**10", "7 / 2 ="
+MATH_QUESTION = re.compile(
+    r"^\s*(?:what\s+is|what's|whats|calculate|compute|solve|evaluate)?\s*([\d\s+\-*/().]+?)\s*[=?!.]*\s*$",
+    re.IGNORECASE
+)
+# "-" and "/" need spaces around them so phone numbers (555-1234) and dates (12/25/2024) are left alone
+HAS_OPERATION = re.compile(r"\d[\s)]*(?:[+*]|\s[-/]\s)")
+
+class MathLimitError(ValueError):
+    pass
+
+def evaluate_node(node, depth=0):
+    """Evaluate a parsed arithmetic expression, allowing only numbers and whitelisted operators."""
+    if depth > MAX_EXPRESSION_DEPTH:
+        raise MathLimitError("expression nested too deeply")
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in MATH_UNARY_OPERATORS:
+        return MATH_UNARY_OPERATORS[type(node.op)](evaluate_node(node.operand, depth + 1))
+    if isinstance(node, ast.BinOp) and type(node.op) in MATH_OPERATORS:
+        left = evaluate_node(node.left, depth + 1)
+        right = evaluate_node(node.right, depth + 1)
+        if isinstance(node.op, ast.Pow) and (abs(right) > MAX_EXPONENT or (abs(left) > 1 and abs(right) * math.log10(abs(left)) > 100)):
+            raise MathLimitError("exponent too large")
+        result = MATH_OPERATORS[type(node.op)](left, right)
+        if isinstance(result, complex) or abs(result) > MAX_RESULT:
+            raise MathLimitError("result too large")
+        return result
+    raise ValueError(f"unsupported expression element: {type(node).__name__}")
+
+@lru_cache(maxsize=1024)
+def calculate(expression):
+    """Evaluate a whitespace-free arithmetic expression; results are cached."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise MathLimitError("expression too long")
+    result = evaluate_node(ast.parse(expression, mode='eval').body)
+    if isinstance(result, float) and result.is_integer() and abs(result) < 1e15:
+        result = int(result)
+    return f"{result:.10g}" if isinstance(result, float) else str(result)
+
 def evaluate_math_expression(expression):
     """Evaluates mathematical expressions with OrcaAI's playful personality."""
     try:
@@ -67,7 +235,7 @@ def evaluate_math_expression(expression):
         if not re.match(r'^[\d+\-*/().]+$', cleaned_expression):
             return None
         
-        result = eval(cleaned_expression)  # Using eval for simple math
+        result = calculate(cleaned_expression)
         return random.choice([
             f"*click* *click* {result}! Did you know Orcas can do complex calculations for echolocation?",
             f"Making waves with mathematics! The answer is {result}. Speaking of numbers, Orcas can swim up to 34 mph!",
@@ -75,41 +243,73 @@ def evaluate_math_expression(expression):
             f"*processing in DeepSeek* The answer is {result}! Fun fact: Orcas use math-like precision in hunting!",
             f"While calculating {result}, I remembered that Orcas can process sound waves at amazing speeds!"
         ])
+    except MathLimitError as e:
+        logging.info(f"Math limit: {e}")
+        return "Whoa, that calculation is deeper than the Mariana Trench! Try something a little smaller."
+    except ZeroDivisionError:
+        return "*click* *click* Dividing by zero? Even an Orca can't echolocate that!"
+    except SyntaxError:
+        # Not a complete expression ("3 +"); let DeepSeek answer it
+        return None
     except Exception as e:
         logging.error(f"Math Error: {e}")
         return "Oops, hit some rough waters with that calculation! Let's try a different approach!"
 
+def answer_math_question(message):
+    """Answer plain arithmetic questions locally; None if the message is not one."""
+    match = MATH_QUESTION.match(message)
+    if not match or not HAS_OPERATION.search(match.group(1)):
+        return None
+    return evaluate_math_expression(match.group(1))
+
+# Trivial intents (and plain arithmetic) are answered locally before the LLM
+intent_router = IntentRouter(
+    default_intents(greeting=lambda message: greeting_pool.get()[0]),
+    handlers={'math': answer_math_question}
+)
+metrics.gauge('intent_router', intent_router.stats)
+
+# Whole-word keyword patterns per response category, checked in order
+SENTIMENT_PATTERNS = [
+    (category, re.compile(r"\b(?:" + "|".join(words) + r")\b"))
+    for category, words in [
+        ('conservation', ['environment', 'protect', 'save', 'ocean', 'climate', 'pollution']),
+        ('educational', ['learn', 'how', 'what', 'why', 'explain', 'teach']),
+        ('fun', ['hello', 'hi', 'hey', 'play', 'joke', 'fun'])
+    ]
+]
+
 def analyze_sentiment(message):
     """Analyze message content for response category."""
-    categories = {
-        'conservation': ['environment', 'protect', 'save', 'ocean', 'climate', 'pollution'],
-        'educational': ['learn', 'how', 'what', 'why', 'explain', 'teach'],
-        'fun': ['hello', 'hi', 'hey', 'play', 'joke', 'fun']
-    }
-    
     message = message.lower()
-    for category, words in categories.items():
-        if any(word in message for word in words):
+    for category, pattern in SENTIMENT_PATTERNS:
+        if pattern.search(message):
             return category
     return 'fun'
 
+def fallback_response(user_message):
+    """Canned in-character reply served without calling DeepSeek."""
+    return orca.get_ocean_response(analyze_sentiment(user_message))
+
+def log_prompt_usage(estimated_tokens, response):
+    """Log estimated vs. upstream-reported prompt tokens for one request."""
+    usage = getattr(response, 'usage', None)
+    reported = getattr(usage, 'prompt_tokens', None)
+    logging.info(f"Prompt tokens: estimated {estimated_tokens}, reported {reported}")
+
 def generate_response(prompt, conversation_history):
-    """Generate enhanced OrcaAI response using conversation history."""
+    """Generate enhanced OrcaAI response using conversation history.
+
+    conversation_history is a list of chat messages as returned by
+    ConversationStore.history; the oldest turns are dropped to fit the
+    prompt-token budget.
+    """
     try:
-        messages = [
-            {"role": "system", "content": orca.system_prompt}
-        ]
-        
-        # Add conversation history for context
-        for exchange in conversation_history:
-            messages.append({"role": "user", "content": exchange["user"]})
-            if "assistant" in exchange:
-                messages.append({"role": "assistant", "content": exchange["assistant"]})
+        messages, prompt_tokens = context_builder.build(orca.system_prompt, conversation_history, prompt)
         
-        # Add current prompt
-        messages.append({"role": "user", "content": prompt})
-        
-        response = client.chat.completions.create(
+        response = create_completion(
+            client,
+            deadline=DEADLINES['interactive'],
             model="deepseek-chat",
             messages=messages,
             max_tokens=200,
@@ -117,6 +317,7 @@ def generate_response(prompt, conversation_history):
             presence_penalty=0.7,
             frequency_penalty=0.5
         )
+        log_prompt_usage(prompt_tokens, response)
         
         response_text = response.choices[0].message.content.strip()
         
@@ -155,89 +356,183 @@ def serve_placeholder_model():
     # Return a basic shape if no model exists
     return send_from_directory('static/models', 'placeholder.glb')
 
+def sse_event(payload):
+    """Format a payload as a single Server-Sent Events frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+# /generate-response steps shared by the Flask route and the ASGI front end
+
+def prepare_response(data):
+    """Validate a request body; return (user message, chat messages, local or cached reply)."""
+    if not data or 'message' not in data:
+        raise ValueError("No message provided")
+
+    user_message = data['message']
+    logging.info(f"Incoming message: {user_message}")
+
+    # Add error checking for API key
+    if not os.getenv('DEEPSEEK_API_KEY'):
+        raise ValueError("DEEPSEEK_API_KEY not set")
+
+    messages = build_messages(user_message)
+    # Greetings, links, facts and arithmetic are answered locally; otherwise try the completion cache
+    cached = intent_router.answer(user_message) or completion_cache.get(RESPONSE_NAMESPACE, user_message)
+    if cached:
+        metrics.inc('web_responses', outcome='local')
+    return user_message, messages, cached
+
+def completion_params(messages, stream=False):
+    """Keyword arguments for the upstream completion of a /generate-response request."""
+    params = dict(RESPONSE_PARAMS, deadline=DEADLINES['interactive'], messages=messages)
+    if stream:
+        params['stream'] = True
+    return params
+
+def finish_response(user_message, response_text):
+    """Cache a fresh completion and build the JSON payload."""
+    completion_cache.set(RESPONSE_NAMESPACE, user_message, response_text)
+    metrics.inc('web_responses', outcome='upstream')
+    return success_payload(response_text)
+
+def success_payload(response_text, fallback=False):
+    payload = {
+        'response': response_text,
+        'status': 'success',
+        'timestamp': datetime.now().isoformat()
+    }
+    if fallback:
+        payload['fallback'] = True
+    return payload
+
+def error_payload(error, user_message=None):
+    """Map a failed request to (payload, HTTP status)."""
+    if isinstance(error, CircuitOpenError):
+        # DeepSeek is failing; answer in character right away instead of queueing behind it
+        metrics.inc('web_responses', outcome='fallback')
+        return success_payload(fallback_response(user_message or ''), fallback=True), 200
+    metrics.inc('web_responses', outcome='error')
+    if isinstance(error, ValueError):
+        logging.error(f"Validation Error: {str(error)}")
+        return {
+            'response': f"*click* *click* {str(error)}",
+            'status': 'error',
+            'timestamp': datetime.now().isoformat()
+        }, 400
+    logging.error(f"API Error: {str(error)}")
+    return {
+        'response': ERROR_RESPONSE,
+        'status': 'error',
+        'timestamp': datetime.now().isoformat()
+    }, 500
+
+def chunk_delta(chunk):
+    return chunk.choices[0].delta.content if chunk.choices else None
+
+def stream_done_payload(messages, parts=None):
+    """Final SSE payload; parts (the streamed deltas) are cached when given."""
+    if parts is not None:
+        completion_cache.set(RESPONSE_NAMESPACE, messages[-1]["content"], ''.join(parts))
+        metrics.inc('web_responses', outcome='upstream')
+    return {'status': 'success', 'done': True, 'timestamp': datetime.now().isoformat()}
+
+def stream_error_payloads(error, messages):
+    """SSE payloads that end a stream which failed before or while streaming."""
+    if isinstance(error, CircuitOpenError):
+        metrics.inc('web_responses', outcome='fallback')
+        return [
+            {'delta': fallback_response(messages[-1]["content"])},
+            {'status': 'success', 'fallback': True, 'done': True, 'timestamp': datetime.now().isoformat()}
+        ]
+    metrics.inc('web_responses', outcome='error')
+    logging.error(f"Streaming Error: {str(error)}")
+    return [{
+        'response': ERROR_RESPONSE,
+        'status': 'error',
+        'done': True,
+        'timestamp': datetime.now().isoformat()
+    }]
+
+def stream_generate_response(messages, cached=None):
+    """Forward DeepSeek completion deltas to the browser as Server-Sent Events."""
+    def generate():
+        try:
+            parts = None
+            if cached:
+                yield sse_event({'delta': cached})
+            else:
+                stream = create_completion(client, **completion_params(messages, stream=True))
+                parts = []
+                for chunk in stream:
+                    delta = chunk_delta(chunk)
+                    if delta:
+                        parts.append(delta)
+                        yield sse_event({'delta': delta})
+            yield sse_event(stream_done_payload(messages, parts))
+        except Exception as e:
+            for payload in stream_error_payloads(e, messages):
+                yield sse_event(payload)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/generate-response', methods=['POST'])
 def handle_generate_response():
+    user_message = None
     try:
         data = request.json
-        if not data or 'message' not in data:
-            raise ValueError("No message provided")
-            
-        user_message = data['message']
-        logging.info(f"Incoming message: {user_message}")
+        user_message, messages, cached = prepare_response(data)
 
-        # Add error checking for API key
-        if not os.getenv('DEEPSEEK_API_KEY'):
-            raise ValueError("DEEPSEEK_API_KEY not set")
+        # Stream deltas as Server-Sent Events when the client asks for it
+        if request.args.get('stream') == '1' or data.get('stream'):
+            return stream_generate_response(messages, cached)
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": orca.system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.9,
-            max_tokens=250
-        )
+        if cached:
+            return jsonify(success_payload(cached))
 
-        return jsonify({
-            'response': response.choices[0].message.content,
-            'status': 'success',
-            'timestamp': datetime.now().isoformat()
-        })
+        # Identical requests already in flight share one upstream call
+        response = create_completion(client, **completion_params(messages))
+        return jsonify(finish_response(user_message, response.choices[0].message.content))
 
-    except ValueError as ve:
-        logging.error(f"Validation Error: {str(ve)}")
-        return jsonify({
-            'response': f"*click* *click* {str(ve)}",
-            'status': 'error',
-            'timestamp': datetime.now().isoformat()
-        }), 400
     except Exception as e:
-        logging.error(f"API Error: {str(e)}")
-        return jsonify({
-            'response': "*click* *click* Oops, hit some rough waters! Let me try again...",
-            'status': 'error',
-            'timestamp': datetime.now().isoformat()
-        }), 500
+        payload, status = error_payload(e, user_message)
+        return jsonify(payload), status
 
 @app.route('/get-greeting')
 def get_greeting():
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": orca.system_prompt},
-                {"role": "user", "content": "Generate a friendly whale-themed greeting"}
-            ],
-            max_tokens=50,
-            temperature=0.9
-        )
+    # Served from the pre-generated pool; falls back while the pool is filling
+    greeting, pooled = greeting_pool.get()
+    return jsonify({
+        'greeting': greeting,
+        'status': 'success' if pooled else 'error'
+    })
 
-        greeting = response.choices[0].message.content.strip()
-        
-        return jsonify({
-            'greeting': greeting,
-            'status': 'success'
-        })
-    except Exception as e:
-        logging.error(f"Greeting API Error: {e}")
-        
-        fallback_greetings = [
-            "*click* *click* Hello! Ready to make waves in the data ocean?",
-            "Greetings from the deep! Let's dive into some problem-solving!",
-            "*Whale song* Welcome! My DeepSeek-powered brain is ready to help!",
-            "Surfacing to say hello! What shall we explore today?",
-            "*click* Ready to swim through some data together?"
-        ]
-        
-        return jsonify({
-            'greeting': random.choice(fallback_greetings),
-            'status': 'error'
-        })
+def metrics_endpoint():
+    # Same exposure as the bot's metrics server: loopback only
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Only registered when metrics are on (ORCA_METRICS=1)
+if metrics.enabled:
+    app.add_url_rule('/metrics', 'metrics_endpoint', metrics_endpoint)
+
+@app.before_request
+def before_request():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
 
 # Add CORS headers
 @app.after_request
 def after_request(response):
+    if metrics.enabled and 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request', time.perf_counter() - g.request_start, {'route': route})
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
@@ -0,0 +1,177 @@
+"""Async serving mode for the OrcaAI web interface.
+
+/generate-response is served natively on the event loop through one shared
+AsyncOpenAI client with a keep-alive connection pool, so a single process can
+hold hundreds of completions in flight. /get-greeting answers from the shared
+greeting pool. Every other route is delegated to the Flask app.
+
+Run with:
+    uvicorn orca_asgi:app --host 0.0.0.0 --port 5000
+"""
+import json
+import logging
+import os
+from urllib.parse import parse_qs
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from openai import AsyncOpenAI
+
+from orca_llm import acreate_completion
+from orca_metrics import metrics
+from orca_api import (
+    app as flask_app,
+    chunk_delta,
+    completion_params,
+    error_payload,
+    finish_response,
+    greeting_pool,
+    prepare_response,
+    sse_event,
+    stream_done_payload,
+    stream_error_payloads,
+    success_payload,
+)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type'),
+    (b'access-control-allow-methods', b'GET,POST,OPTIONS'),
+]
+
+# One pooled client per process, created on startup and shared by all requests
+async_client = None
+
+def create_async_client():
+    """Create the shared AsyncOpenAI client with a keep-alive connection pool."""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('DEEPSEEK_MAX_CONNECTIONS', 500)),
+        max_keepalive_connections=int(os.getenv('DEEPSEEK_MAX_KEEPALIVE', 100)),
+        keepalive_expiry=30.0
+    )
+    return AsyncOpenAI(
+        api_key=os.getenv('DEEPSEEK_API_KEY'),
+        base_url=os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com"),
+        http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0, connect=5.0))
+    )
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        async_client = create_async_client()
+    return async_client
+
+async def read_json(receive):
+    """Read and decode a JSON request body."""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return json.loads(body) if body else None
+
+async def send_json(send, payload, status=200):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(payload).encode()})
+
+async def send_event(send, payload, more_body=True):
+    await send({'type': 'http.response.body', 'body': sse_event(payload).encode(), 'more_body': more_body})
+
+async def stream_generate_response(send, messages, cached=None):
+    """Forward DeepSeek completion deltas as Server-Sent Events."""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + CORS_HEADERS
+    })
+    try:
+        parts = None
+        if cached:
+            await send_event(send, {'delta': cached})
+        else:
+            stream = await acreate_completion(get_async_client(), **completion_params(messages, stream=True))
+            parts = []
+            async for chunk in stream:
+                delta = chunk_delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    await send_event(send, {'delta': delta})
+        final = [stream_done_payload(messages, parts)]
+    except Exception as e:
+        final = stream_error_payloads(e, messages)
+
+    for i, payload in enumerate(final):
+        await send_event(send, payload, more_body=i < len(final) - 1)
+
+async def handle_generate_response(scope, receive, send):
+    user_message = None
+    try:
+        data = await read_json(receive)
+        user_message, messages, cached = prepare_response(data)
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('stream') == ['1'] or data.get('stream'):
+            return await stream_generate_response(send, messages, cached)
+
+        if cached:
+            return await send_json(send, success_payload(cached))
+
+        response = await acreate_completion(get_async_client(), **completion_params(messages))
+        await send_json(send, finish_response(user_message, response.choices[0].message.content))
+
+    except Exception as e:
+        payload, status = error_payload(e, user_message)
+        await send_json(send, payload, status=status)
+
+async def get_greeting(scope, receive, send):
+    # The pool is refilled by its own thread, so this never waits on DeepSeek
+    greeting, pooled = greeting_pool.get()
+    await send_json(send, {
+        'greeting': greeting,
+        'status': 'success' if pooled else 'error'
+    })
+
+async def lifespan(scope, receive, send):
+    global async_client
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_async_client()
+            logging.info("Shared DeepSeek connection pool ready")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if async_client is not None:
+                await async_client.close()
+                async_client = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async_routes = {
+    ('POST', '/generate-response'): handle_generate_response,
+    ('GET', '/get-greeting'): get_greeting,
+}
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+async def app(scope, receive, send):
+    """ASGI entry point: async DeepSeek routes, Flask for everything else."""
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+
+    handler = None
+    if scope['type'] == 'http':
+        handler = async_routes.get((scope['method'], scope['path']))
+
+    if handler:
+        with metrics.timer('http_request', route=scope['path']):
+            return await handler(scope, receive, send)
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,219 @@
+"""Completion cache shared by the web interface and the Telegram bot.
+
+Prompts are normalized (case, punctuation, whitespace) and looked up by exact
+match first, then optionally by word-level Jaccard similarity against other
+prompts sent with the same system prompt and sampling settings. Near-duplicate
+candidates come from a per-namespace MinHash/LSH index, so a miss does not scan
+the store. Entries expire after a TTL and the store is bounded with
+least-recently-used eviction.
+
+Backends:
+    memory - in-process OrderedDict (default)
+    sqlite - local on-disk store that survives restarts
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from orca_similarity import NearDuplicateIndex, all_words, choose_bands
+
+def normalize_prompt(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def make_namespace(system_prompt, **params):
+    """Identify the completion settings a cached response belongs to."""
+    payload = json.dumps({"system": system_prompt, "params": params}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+class MemoryCacheBackend:
+    """In-process LRU store."""
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (namespace, prompt, response, created_at)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key, namespace, prompt, response, created_at):
+        self.entries[key] = (namespace, prompt, response, created_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def candidates(self, namespace):
+        """Return (key, normalized prompt) pairs stored under a namespace."""
+        return [(key, entry[1]) for key, entry in self.entries.items() if entry[0] == namespace]
+
+    def __len__(self):
+        return len(self.entries)
+
+class SQLiteCacheBackend:
+    """On-disk LRU store backed by a local SQLite database."""
+    def __init__(self, path="orca_cache.db", max_entries=10000):
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS completions_namespace ON completions (namespace)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+        self.conn.commit()
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT namespace, prompt, response, created_at FROM completions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self.conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return row
+
+    def set(self, key, namespace, prompt, response, created_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+            (key, namespace, prompt, response, created_at, time.time())
+        )
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY accessed_at LIMIT ?)", (overflow,)
+            )
+        self.conn.commit()
+
+    def delete(self, key):
+        self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+        self.conn.commit()
+
+    def candidates(self, namespace):
+        return self.conn.execute(
+            "SELECT key, prompt FROM completions WHERE namespace = ?", (namespace,)
+        ).fetchall()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+class CompletionCache:
+    """Exact and near-duplicate completion lookup with TTL expiry and hit/miss counters."""
+    def __init__(self, backend=None, ttl=3600, similarity_threshold=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.indexes = {}  # namespace -> NearDuplicateIndex of normalized prompt -> key
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def make_key(self, namespace, normalized):
+        return hashlib.sha1(f"{namespace}\0{normalized}".encode()).hexdigest()
+
+    def get(self, namespace, prompt):
+        """Return a cached response for the prompt, or None on a miss."""
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        with self.lock:
+            entry = self.lookup(self.make_key(namespace, normalized), now)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+
+            if self.similarity_threshold:
+                best_key, best_score = self.index(namespace).best_match(normalized)
+                if best_key is not None and best_score >= self.similarity_threshold:
+                    # Evicted or expired keys simply miss here
+                    entry = self.lookup(best_key, now)
+                    if entry is not None:
+                        self.near_hits += 1
+                        return entry[2]
+
+            self.misses += 1
+            return None
+
+    def index(self, namespace):
+        """Near-duplicate index for a namespace, loaded from the backend on first use."""
+        index = self.indexes.get(namespace)
+        if index is None:
+            index = self.indexes[namespace] = NearDuplicateIndex(
+                threshold=self.similarity_threshold,
+                capacity=getattr(self.backend, 'max_entries', 1000),
+                num_perm=32,
+                bands=choose_bands(self.similarity_threshold, 32),
+                # Stopwords such as "not" and "how" change what a prompt asks
+                features=all_words
+            )
+            for key, prompt in self.backend.candidates(namespace):
+                index.add(prompt, key)
+        return index
+
+    def lookup(self, key, now):
+        entry = self.backend.get(key)
+        if entry is not None and now - entry[3] > self.ttl:
+            self.backend.delete(key)
+            return None
+        return entry
+
+    def set(self, namespace, prompt, response):
+        normalized = normalize_prompt(prompt)
+        if not normalized or not response:
+            return
+        key = self.make_key(namespace, normalized)
+        with self.lock:
+            self.backend.set(key, namespace, normalized, response, time.time())
+            # Indexes not loaded yet pick the new entry up from the backend
+            if namespace in self.indexes:
+                self.indexes[namespace].add(normalized, key)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0,
+                'size': len(self.backend)
+            }
+
+def create_cache_from_env():
+    """Build the completion cache from ORCA_CACHE_* environment variables."""
+    backend_name = os.getenv('ORCA_CACHE_BACKEND', 'memory').lower()
+    max_entries = int(os.getenv('ORCA_CACHE_SIZE', 1000))
+    threshold = os.getenv('ORCA_CACHE_SIMILARITY')
+
+    if backend_name == 'sqlite':
+        try:
+            backend = SQLiteCacheBackend(os.getenv('ORCA_CACHE_PATH', 'orca_cache.db'), max_entries)
+        except sqlite3.Error as e:
+            logging.error(f"Cache Error: falling back to memory backend: {e}")
+            backend = MemoryCacheBackend(max_entries)
+    else:
+        backend = MemoryCacheBackend(max_entries)
+
+    return CompletionCache(
+        backend,
+        ttl=int(os.getenv('ORCA_CACHE_TTL', 3600)),
+        similarity_threshold=float(threshold) if threshold else None
+    )
@@ -0,0 +1,133 @@
+"""Local intent routing in front of the LLM.
+
+Short, high-frequency messages (greetings, "where are your links?", "tell me
+an orca fact") are answered from templates without a DeepSeek call. Messages
+are normalized the same way as cache keys and matched against one
+precompiled alternation with a named group per intent, so routing costs a
+single regex match. Anything that is not an exact trivial intent, including
+every real question, goes upstream.
+"""
+import random
+import re
+import threading
+
+from orca_cache import normalize_prompt
+
+# Optional ways of addressing the bot around an intent ("hey orca", "... please")
+ADDRESS = r"(?:(?:hey |hi |ok |okay )?orca(?: ?ai)? )?"
+POLITE = r"(?: (?:please|pls|orca(?: ?ai)?|thanks|thank you))*"
+
+GREETING_PATTERN = (
+    ADDRESS + r"(?:hey|hi|hello|hiya|howdy|yo|sup|gm|greetings|good (?:morning|afternoon|evening)|"
+    r"what s up|whats up|wassup|hey there|hi there|hello there)"
+    r"(?: (?:orca(?: ?ai)?|there|friend|buddy|everyone|all))?" + POLITE
+    + r"|(?:hey |hi |hello |yo )?orca(?: ?ai)?"
+)
+LINK_NOUNS = r"(?:links?|socials?|social media|social links)"
+PLATFORMS = r"(?:twitter|x account|github|telegram|website|site)"
+ACCOUNT = r"(?: (?:links?|accounts?|handle))"
+# A bare platform name is a links request on its own or after send/share/...;
+# after "what is/are" it needs "your"/"the" or a link noun ("what is github" is a real question)
+LINKS_PATTERN = (
+    ADDRESS + r"(?:(?:send|share|give me|show me|drop)(?: me)? (?:your |the )?)?"
+    + r"(?:" + LINK_NOUNS + "|" + PLATFORMS + ")" + ACCOUNT + "?" + POLITE
+    + "|" + ADDRESS + r"(?:what s|whats|what is|what are) "
+    + r"(?:your (?:" + LINK_NOUNS + "|" + PLATFORMS + ")" + ACCOUNT + "?"
+    + r"|the " + LINK_NOUNS + r"|(?:the )?" + PLATFORMS + ACCOUNT + ")" + POLITE
+    + r"|where (?:can|do) i (?:follow|find) (?:you|orca(?: ?ai)?)(?: online)?"
+)
+FACT_PATTERN = (
+    ADDRESS + r"(?:(?:tell me|give me|share|send|drop|got)(?: me)? )?(?:a |an |another |one more |some )?"
+    r"(?:(?:fun|random|cool|whale|orca|ocean|marine) )*facts?" + POLITE
+)
+
+LINKS_TEXT = """🌊 *Follow OrcaAI*
+
+X: https://x.com/orcaaiseek
+GitHub: https://github.com/spartansfighthard/orcaAI
+Telegram: https://t.me/OrcaAiportal
+
+Join our pod! 🐋"""
+
+GREETING_REPLIES = [
+    "*click* *click* Hello! Ready to make waves in the data ocean?",
+    "Greetings from the deep! What shall we dive into today?",
+    "*Whale song* Hey there! My DeepSeek-powered brain is ready to help!",
+    "Surfacing to say hello! 🐋 Ask me anything!",
+    "*click* Hi! Ready to swim through some data together?"
+]
+
+ORCA_FACTS = [
+    "*click* *click* Orcas are actually the largest members of the dolphin family, not whales!",
+    "Orcas can swim up to 34 mph, making them one of the fastest marine mammals! 🌊",
+    "Orcas can dive up to 3,000 feet deep while hunting!",
+    "Orcas have the second-largest brain among marine mammals, weighing up to 15 pounds! 🧠",
+    "Each orca pod has its own dialect of clicks and calls, passed down through generations!",
+    "Orcas live in every ocean on Earth, from the Arctic to the Antarctic! 🐋",
+    "Female orcas can live over 80 years, and grandmothers often lead their pods!",
+    "Orcas hunt cooperatively, using teamwork strategies that vary from pod to pod!"
+]
+
+class IntentRouter:
+    """Answer trivial intents locally and count how much traffic stays off the LLM.
+
+    intents maps a name to (pattern, responder); patterns must match the whole
+    normalized message. handlers are callables tried first that return a
+    reply or None (e.g. the arithmetic fast path).
+    """
+    def __init__(self, intents, handlers=None, max_words=10):
+        self.responders = {name: responder for name, (_, responder) in intents.items()}
+        self.pattern = re.compile("|".join(f"(?P<{name}>{pattern})" for name, (pattern, _) in intents.items()))
+        self.handlers = handlers or {}
+        self.max_words = max_words
+        self.lock = threading.Lock()
+        self.routed = {name: 0 for name in list(self.handlers) + list(self.responders)}
+        self.upstream = 0
+
+    def classify(self, message):
+        """Return the matched intent name, or None."""
+        normalized = normalize_prompt(message)
+        if not normalized or normalized.count(" ") >= self.max_words:
+            return None
+        match = self.pattern.fullmatch(normalized)
+        return match.lastgroup if match else None
+
+    def answer(self, message):
+        """Reply locally when the message is a trivial intent; None means send it upstream."""
+        for name, handler in self.handlers.items():
+            reply = handler(message)
+            if reply:
+                self.count(name)
+                return reply
+
+        intent = self.classify(message)
+        if intent is None:
+            self.count(None)
+            return None
+        self.count(intent)
+        return self.responders[intent](message)
+
+    def count(self, intent):
+        with self.lock:
+            if intent is None:
+                self.upstream += 1
+            else:
+                self.routed[intent] += 1
+
+    def stats(self):
+        with self.lock:
+            local = sum(self.routed.values())
+            total = local + self.upstream
+            return dict(
+                self.routed,
+                upstream=self.upstream,
+                offload_ratio=local / total if total else 0.0
+            )
+
+def default_intents(greeting=None, fact=None):
+    """Greeting, links and fact intents with template replies (overridable per front end)."""
+    return {
+        'greeting': (GREETING_PATTERN, greeting or (lambda message: random.choice(GREETING_REPLIES))),
+        'links': (LINKS_PATTERN, lambda message: LINKS_TEXT),
+        'fact': (FACT_PATTERN, fact or (lambda message: random.choice(ORCA_FACTS))),
+    }
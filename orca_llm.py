@@ -0,0 +1,265 @@
+"""Single-flight coalescing for DeepSeek completions.
+
+Concurrent requests with the same model, messages and sampling parameters
+share one upstream call: the first caller makes it and everyone who arrives
+while it is in flight receives the same response. Nothing is stored once the
+call finishes, so this only merges requests that overlap in time; repeated
+prompts over longer windows are the completion cache's job.
+
+Works from worker threads (the Flask app) and from an event loop (the bot and
+the ASGI app). Streaming requests are never coalesced.
+
+Every upstream call also goes through a shared circuit breaker. When too many
+recent calls fail or run slower than slow_call_duration, the breaker opens and
+calls raise CircuitOpenError immediately, so callers serve their canned
+fallbacks instead of waiting out the client timeout. After recovery_time one
+probe call is let through; its outcome closes or re-opens the breaker.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from openai import APITimeoutError
+from openai.types.chat import ChatCompletion
+
+from orca_metrics import metrics
+
+def completion_key(**params):
+    """Identify a completion request by everything that affects its output."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class Call:
+    """An in-flight threaded call and the callers waiting on it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}        # key -> Call
+        self.async_calls = {}  # (loop, key) -> asyncio.Task
+        self.requests = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key across threads; waiters get its result or error."""
+        with self.lock:
+            self.requests += 1
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self.calls[key] = Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, fn):
+        """Await fn() once per key on the running loop.
+
+        The upstream call runs as its own task, so a caller that is cancelled
+        (e.g. a handler timing out) does not cancel it for the others.
+        """
+        loop_key = (asyncio.get_running_loop(), key)
+        with self.lock:
+            self.requests += 1
+            task = self.async_calls.get(loop_key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = self.async_calls[loop_key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self.forget(loop_key))
+        return await asyncio.shield(task)
+
+    def forget(self, loop_key):
+        with self.lock:
+            self.async_calls.pop(loop_key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'in_flight': len(self.calls) + len(self.async_calls)
+            }
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+def is_upstream_failure(error):
+    """Connection errors, timeouts, 5xx and 429 count against the upstream; other 4xx do not."""
+    status = getattr(error, 'status_code', None)
+    return status is None or status >= 500 or status == 429
+
+class CircuitBreaker:
+    def __init__(self, window=20, min_calls=5, failure_ratio=0.5, slow_call_duration=10.0, recovery_time=30.0):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_duration = slow_call_duration
+        self.recovery_time = recovery_time
+        self.outcomes = deque(maxlen=window)  # True for failed or slow calls
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def allow(self):
+        """Whether a call may go upstream now (half-open lets a single probe through)."""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.recovery_time:
+                    self.stats['rejected'] += 1
+                    return False
+                self.state = 'half_open'
+                self.probing = False
+            if self.probing:
+                self.stats['rejected'] += 1
+                return False
+            self.probing = True
+            return True
+
+    def record(self, latency, failed=False):
+        failed = failed or latency > self.slow_call_duration
+        with self.lock:
+            if self.state == 'half_open':
+                self.probing = False
+                if failed:
+                    self.trip()
+                else:
+                    self.state = 'closed'
+                    self.outcomes.clear()
+                    logging.info("DeepSeek circuit closed")
+                return
+            if self.state == 'open':
+                return
+
+            self.outcomes.append(failed)
+            if len(self.outcomes) >= self.min_calls and sum(self.outcomes) / len(self.outcomes) >= self.failure_ratio:
+                self.trip()
+
+    def abandon(self):
+        """A call was cancelled before finishing; let another probe through if it was one."""
+        with self.lock:
+            if self.state == 'half_open':
+                self.probing = False
+
+    def trip(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self.stats['opened'] += 1
+        logging.warning(f"DeepSeek circuit open, serving fallbacks for {self.recovery_time:.0f}s")
+
+    def before_call(self):
+        if not self.allow():
+            raise CircuitOpenError("DeepSeek circuit open")
+        return time.monotonic()
+
+    def after_call(self, start, error=None):
+        self.record(time.monotonic() - start, failed=error is not None and is_upstream_failure(error))
+
+# Shared by every client in the process
+completions = SingleFlight()
+breaker = CircuitBreaker(
+    slow_call_duration=float(os.getenv('DEEPSEEK_SLOW_CALL', 10)),
+    recovery_time=float(os.getenv('DEEPSEEK_RECOVERY_TIME', 30))
+)
+metrics.gauge('completion_coalescing', completions.stats)
+metrics.gauge('circuit_breaker', lambda: dict(breaker.stats, open=int(breaker.state != 'closed')))
+
+# Per-endpoint deadlines in seconds: user-facing replies give up sooner than background jobs
+DEADLINES = {
+    'interactive': float(os.getenv('DEEPSEEK_DEADLINE_INTERACTIVE', 15)),
+    'background': float(os.getenv('DEEPSEEK_DEADLINE_BACKGROUND', 45)),
+}
+
+def bounded(client, deadline):
+    """Apply a per-read timeout and drop retries; callers enforce the total deadline."""
+    if deadline is None:
+        return client
+    return client.with_options(timeout=deadline, max_retries=0)
+
+def create_within(client, deadline, **params):
+    """Non-streaming create that gives up once `deadline` seconds have passed in total.
+
+    The client timeout only bounds each read, so an upstream trickling keep-alive
+    bytes could hold the call open indefinitely; the body is read in chunks instead
+    and abandoned as soon as the deadline is exceeded.
+    """
+    start = time.monotonic()
+    with bounded(client, deadline).chat.completions.with_streaming_response.create(**params) as response:
+        body = []
+        for chunk in response.iter_bytes():
+            if time.monotonic() - start > deadline:
+                raise APITimeoutError(request=response.http_response.request)
+            body.append(chunk)
+    return ChatCompletion.construct(**json.loads(b"".join(body)))
+
+def create_completion(client, deadline=None, coalesce=True, **params):
+    """client.chat.completions.create behind the circuit breaker, coalesced with
+    identical in-flight requests unless streaming or coalesce=False."""
+    def call():
+        start = breaker.before_call()
+        try:
+            with metrics.timer('deepseek_request', model=params.get('model')):
+                if deadline is None or params.get('stream'):
+                    response = bounded(client, deadline).chat.completions.create(**params)
+                else:
+                    response = create_within(client, deadline, **params)
+        except Exception as e:
+            breaker.after_call(start, e)
+            raise
+        breaker.after_call(start)
+        return response
+
+    if params.get('stream') or not coalesce:
+        return call()
+    return completions.do(completion_key(**params), call)
+
+async def acreate_completion(client, deadline=None, coalesce=True, **params):
+    """Async variant of create_completion for AsyncOpenAI clients."""
+    async def call():
+        start = breaker.before_call()
+        try:
+            with metrics.timer('deepseek_request', model=params.get('model')):
+                # wait_for bounds the whole call, not just each read; a timeout counts as a failure
+                response = await asyncio.wait_for(bounded(client, deadline).chat.completions.create(**params), deadline)
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception as e:
+            breaker.after_call(start, e)
+            raise
+        breaker.after_call(start)
+        return response
+
+    if params.get('stream') or not coalesce:
+        return await call()
+    return await completions.do_async(completion_key(**params), call)
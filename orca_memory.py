@@ -0,0 +1,214 @@
+"""Bounded per-user conversation memory.
+
+Each user keeps a sliding window of their most recent exchanges, stored as
+ready-to-send chat messages so building a prompt never re-walks the history.
+Users idle for longer than idle_ttl are dropped and the number of users held
+in memory is capped with least-recently-used eviction. With a path set, every
+exchange is also appended to a local SQLite database (trimmed to the same
+window) so memory survives restarts and evicted users are reloaded on demand.
+
+ContextBuilder fits a history into a token budget before it is sent upstream,
+dropping the oldest turns first.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class ConversationStore:
+    def __init__(self, window=5, idle_ttl=86400, max_users=10000, path=None, sweep_every=256):
+        self.window = window
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        self.sweep_every = sweep_every
+        self.users = OrderedDict()  # user_id -> [deque of messages, last_seen]
+        self.lock = threading.Lock()
+        self.operations = 0
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS conversation_messages_user ON conversation_messages (user_id, id)"
+            )
+            self.conn.commit()
+
+    def history(self, user_id):
+        """Return the user's recent messages, oldest first."""
+        with self.lock:
+            entry = self.touch(user_id)
+            return list(entry[0])
+
+    def append(self, user_id, user_message, assistant_message):
+        """Record one exchange, dropping the oldest beyond the window."""
+        messages = [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_message}
+        ]
+        with self.lock:
+            entry = self.touch(user_id)
+            entry[0].extend(messages)
+            if self.conn is not None:
+                self.persist(user_id, messages)
+
+    def clear(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM conversation_messages WHERE user_id = ?", (str(user_id),))
+                self.conn.commit()
+
+    def touch(self, user_id):
+        """Fetch (or load) a user's window and mark it most recently used."""
+        now = time.time()
+        entry = self.users.get(user_id)
+        if entry is not None and now - entry[1] > self.idle_ttl:
+            self.users.pop(user_id)
+            entry = None
+
+        if entry is None:
+            entry = [deque(self.load(user_id), maxlen=self.window * 2), now]
+            self.users[user_id] = entry
+        entry[1] = now
+        self.users.move_to_end(user_id)
+
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+
+        self.operations += 1
+        if self.operations % self.sweep_every == 0:
+            self.evict_idle(now)
+        return entry
+
+    def evict_idle(self, now=None):
+        """Drop users idle for longer than idle_ttl (oldest are at the front) and their stored rows."""
+        now = now or time.time()
+        while self.users:
+            user_id, entry = next(iter(self.users.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            self.users.popitem(last=False)
+
+        if self.conn is not None:
+            self.conn.execute("DELETE FROM conversation_messages WHERE created_at < ?", (now - self.idle_ttl,))
+            self.conn.commit()
+
+    def load(self, user_id):
+        if self.conn is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT role, content, created_at FROM conversation_messages "
+            "WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (str(user_id), self.window * 2)
+        ).fetchall()
+        if rows and time.time() - rows[0][2] > self.idle_ttl:
+            return []
+        return [{"role": role, "content": content} for role, content, _ in reversed(rows)]
+
+    def persist(self, user_id, messages):
+        try:
+            now = time.time()
+            self.conn.executemany(
+                "INSERT INTO conversation_messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(str(user_id), m["role"], m["content"], now) for m in messages]
+            )
+            # Keep the on-disk log bounded to the same window per user
+            self.conn.execute(
+                "DELETE FROM conversation_messages WHERE user_id = ? AND id NOT IN "
+                "(SELECT id FROM conversation_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                (str(user_id), str(user_id), self.window * 2)
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store error: {e}")
+
+    def __len__(self):
+        return len(self.users)
+
+def create_store_from_env():
+    """Build the conversation store from ORCA_MEMORY_* environment variables."""
+    return ConversationStore(
+        window=int(os.getenv('ORCA_MEMORY_WINDOW', 5)),
+        idle_ttl=int(os.getenv('ORCA_MEMORY_IDLE_TTL', 86400)),
+        max_users=int(os.getenv('ORCA_MEMORY_MAX_USERS', 10000)),
+        path=os.getenv('ORCA_MEMORY_PATH')
+    )
+
+class TokenCounter:
+    """Count tokens with tiktoken when installed, else estimate ~4 characters per token."""
+    def __init__(self, encoding='cl100k_base'):
+        self.encoder = None
+        if tiktoken is not None:
+            try:
+                self.encoder = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logging.error(f"Tokenizer unavailable, estimating token counts: {e}")
+        self.static_counts = {}
+
+    def count(self, text):
+        if self.encoder is not None:
+            return len(self.encoder.encode(text))
+        return (len(text) + 3) // 4
+
+    def count_static(self, text):
+        """Count a text that never changes (system prompts) once per process."""
+        tokens = self.static_counts.get(text)
+        if tokens is None:
+            tokens = self.static_counts[text] = self.count(text)
+        return tokens
+
+    def count_message(self, message):
+        return self.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+class ContextBuilder:
+    """Build chat messages that fit a prompt-token budget, trimming the oldest turns."""
+    def __init__(self, budget=3000, counter=None):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+
+    def build(self, system_prompt, history, prompt):
+        """Return (messages, estimated prompt tokens)."""
+        used = self.counter.count_static(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        used += self.counter.count(prompt) + MESSAGE_OVERHEAD_TOKENS
+
+        kept = []
+        for message in reversed(history):
+            tokens = self.counter.count_message(message)
+            if used + tokens > self.budget:
+                break
+            kept.append((message, tokens))
+            used += tokens
+
+        # Never start the window on a dangling assistant reply
+        while kept and kept[-1][0]["role"] == "assistant":
+            used -= kept.pop()[1]
+
+        if len(kept) < len(history):
+            logging.info(f"Context trimmed: kept {len(kept)} of {len(history)} history messages")
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(message for message, _ in reversed(kept))
+        messages.append({"role": "user", "content": prompt})
+        return messages, used
+
+def create_context_builder_from_env():
+    return ContextBuilder(budget=int(os.getenv('ORCA_CONTEXT_BUDGET', 3000)))
@@ -0,0 +1,222 @@
+"""Lightweight instrumentation for the web interface and the Telegram bot.
+
+Timers, counters and latency summaries (p50/p95/p99 over a sliding window of
+recent samples), exported in the Prometheus text format. The Flask app serves
+them at /metrics to loopback clients only; the bot runs a small HTTP server on
+127.0.0.1:ORCA_METRICS_PORT.
+
+Disabled unless ORCA_METRICS=1: every recording call then returns after a
+single attribute check, and timers hand back a shared no-op context.
+
+tracemalloc snapshots are taken on demand (admin command or SIGUSR1) rather
+than tracing for the life of the process.
+"""
+import functools
+import inspect
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = self.labels
+        if exc_type is not None:
+            labels = labels + (('outcome', 'error'),)
+        self.metrics.observe(self.name, time.perf_counter() - self.start, labels)
+        return False
+
+class Summary:
+    """Count, sum and a sliding window of samples for quantiles."""
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+def label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+class Metrics:
+    def __init__(self, enabled=False, prefix='orca', window=1024):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.window = window
+        self.lock = threading.Lock()
+        self.counters = {}   # (name, labels) -> value
+        self.summaries = {}  # (name, labels) -> Summary
+        self.gauges = {}     # name -> callable returning a number or {label value: number}
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        if not self.enabled:
+            return
+        key = (name, labels if isinstance(labels, tuple) else label_key(labels))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = Summary(self.window)
+            summary.add(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager recording the duration of the block in seconds."""
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, label_key(labels))
+
+    def timed(self, name, **labels):
+        """Decorator timing every call of a sync or async function."""
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def gauge(self, name, fn):
+        """Register a callable sampled at export time (pool depths, cache stats...)."""
+        self.gauges[name] = fn
+
+    def render(self):
+        """Export everything in the Prometheus text format."""
+        if not self.enabled:
+            return "# metrics disabled (set ORCA_METRICS=1)\n"
+
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items(), key=lambda item: item[0])
+            summaries = [(key, summary.count, summary.total, summary.quantiles()) for key, summary in summaries]
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+
+        for (name, labels), count, total, quantiles in summaries:
+            metric = f"{self.prefix}_{name}_seconds"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} summary")
+                seen.add(metric)
+            for q, value in quantiles.items():
+                lines.append(f"{metric}{format_labels(labels, [('quantile', q)])} {value:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total:.6f}")
+
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception as e:
+                logging.error(f"Metrics gauge {name} failed: {e}")
+                continue
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            if isinstance(value, dict):
+                for key, item in sorted(value.items()):
+                    if isinstance(item, (int, float)):
+                        lines.append(f'{metric}{{key="{key}"}} {item}')
+            else:
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+def memory_snapshot(limit=10):
+    """Top allocation sites as text lines; starts tracing first if it is off."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        return ["tracemalloc started; request another snapshot to see allocations"]
+
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"traced memory: current {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB"]
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks")
+    return lines
+
+def install_snapshot_signal(signum=getattr(signal, 'SIGUSR1', None)):
+    """Log a memory snapshot whenever the process receives SIGUSR1."""
+    if signum is None:
+        return
+    signal.signal(signum, lambda *_: logging.info("\n".join(memory_snapshot())))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host='127.0.0.1'):
+    """Serve /metrics from a daemon thread (for processes without a web app)."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
+
+metrics = Metrics(enabled=os.getenv('ORCA_METRICS', '').lower() in ('1', 'true', 'yes'))
@@ -0,0 +1,79 @@
+"""Per-message cost of the output sanitizers in telegram_bot.py.
+
+Times each channel's TextSanitizer.clean against the replace-and-split loop
+it replaced, on a handful of typical tweets and broadcasts, and prints the
+mean cost per message in microseconds.
+
+Usage:
+    python sanitizer_benchmark.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# The bot builds its DeepSeek client at import; no request is made here
+os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+from telegram_bot import sanitizers
+
+MESSAGES = [
+    "*click* *click* Did you know transformer models now handle million-token contexts? 🐋 #AI #DeepLearning",
+    "Just like a pod hunting together, agents coordinate better with shared memory 🌊✨ making waves in robotics!",
+    "Sparse attention cuts inference cost by 40% on long documents. The trade-off is recall on rare tokens. #MachineLearning",
+    "🤖 Swimming through the data ocean today... dive into retrieval pipelines with me! 💡 #OceanIntelligence",
+    "Quantized models keep 98% of their accuracy at 4 bits, which makes on-device assistants practical.",
+]
+
+# The loops the sanitizers replaced, kept here as the baseline
+TWEET_PATTERNS = ["Did you know", "Just like", "dive into", "making waves", "swimming", "splash",
+                  "*click*", "whale", "ocean", "🐋", "🌊", "🎶", "✨", "#"]
+BROADCAST_PATTERNS = ['*click* *click*', 'Did you know', 'Just like', 'dive into', 'making waves',
+                      'swimming through', '#']
+LEGACY_PATTERNS = ["Did you know", "Just like", "dive into", "making waves", "swimming through",
+                   "*click* *click*", "🐋", "🌊", "🎶", "✨", "#AI", "#OceanIntelligence", "#OceanFacts"]
+EMOJIS = ['🐋', '🌊', '🎶', '✨', '🐳', '🔬', '🤖', '💡']
+
+def capitalize(text):
+    text = text.strip()
+    return text[0].upper() + text[1:] if text else text
+
+def old_tweet(text):
+    for pattern in TWEET_PATTERNS:
+        text = text.replace(pattern, "")
+    text = ' '.join(word for word in text.split()
+                    if not any(char in word for char in EMOJIS) and not word.startswith('#'))
+    return capitalize(text)
+
+def old_broadcast(text):
+    for pattern in BROADCAST_PATTERNS:
+        text = text.replace(pattern, '')
+    text = ' '.join(word for word in text.split() if not word.startswith(('🐋', '🌊', '🐳', '🔬', '🤖', '💡')))
+    return capitalize(text)
+
+def old_legacy(text):
+    for pattern in LEGACY_PATTERNS:
+        text = text.replace(pattern, "")
+    text = ' '.join(word for word in text.split() if not word.startswith('#'))
+    text = ' '.join(word for word in text.split() if not any(char in word for char in EMOJIS))
+    return text.strip()
+
+BASELINES = {'tweet': old_tweet, 'broadcast': old_broadcast, 'legacy': old_legacy}
+
+def per_message_us(clean, number):
+    seconds = timeit.timeit(lambda: [clean(message) for message in MESSAGES], number=number)
+    return seconds / (number * len(MESSAGES)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{len(MESSAGES)} messages, mean {sum(map(len, MESSAGES)) / len(MESSAGES):.0f} characters")
+    for channel, baseline in BASELINES.items():
+        compiled = per_message_us(sanitizers[channel].clean, args.number)
+        loop = per_message_us(baseline, args.number)
+        print(f"  {channel:<9} sanitizer {compiled:6.2f} us/message   replace loop {loop:6.2f} us/message")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Benchmark NearDuplicateIndex against the original pairwise Jaccard loop.
+
+Builds a synthetic history of tweets in the style the bot posts (two short
+declarative sentences about AI technology drawn from a shared vocabulary, so
+unrelated tweets overlap on common words), plus paraphrased near-duplicates of
+earlier tweets. For each query it compares the LSH candidate count and lookup
+time with a full scan and with the original pairwise Jaccard loop, and checks
+that the index reaches the same duplicate verdicts as the full scan.
+
+Usage:
+    python similarity_benchmark.py [--history 20000] [--queries 200] [--threshold 0.25]
+"""
+import argparse
+import random
+import sys
+import time
+
+from orca_similarity import NearDuplicateIndex, jaccard
+
+SUBJECTS = [
+    "transformer architectures", "attention mechanisms", "diffusion models", "language models",
+    "reinforcement learning agents", "vision transformers", "mixture-of-experts layers",
+    "retrieval pipelines", "embedding models", "speech recognition systems", "graph neural networks",
+    "sparse models", "quantized models", "multimodal systems", "robotic control policies",
+    "recommendation engines", "code generation models", "federated training setups",
+    "edge inference chips", "synthetic data pipelines", "evaluation benchmarks", "tokenizers",
+    "optimizers", "distillation methods", "alignment techniques", "vector databases",
+    "state space models", "protein folding models", "autonomous vehicles", "warehouse robots",
+    "medical imaging classifiers", "fraud detection systems", "weather forecasting models",
+    "translation systems", "search ranking models", "chip design tools", "compiler autotuners",
+    "anomaly detectors", "time series forecasters", "humanoid robots", "drone navigation stacks",
+    "document parsers", "agent frameworks", "scheduling solvers", "sensor fusion pipelines"
+]
+VERBS = [
+    "reveals", "shows", "improves", "reduces", "changes", "highlights", "enables", "accelerates",
+    "simplifies", "limits", "shifts", "exposes", "clarifies", "supports", "extends", "constrains",
+    "doubles", "halves", "stabilizes", "complicates", "unlocks", "outperforms baselines on"
+]
+QUALIFIERS = [
+    "interesting", "measurable", "consistent", "significant", "surprising", "practical", "clear",
+    "early", "steady", "notable", "real", "emerging", "predictable", "nonlinear", "modest",
+    "uneven", "dramatic", "incremental", "overlooked", "reproducible", "hidden", "growing"
+]
+OBJECTS = [
+    "scaling properties", "memory usage", "inference latency", "training stability", "context length",
+    "energy efficiency", "sample efficiency", "error rates", "throughput", "robustness", "accuracy",
+    "generalization", "data requirements", "hardware utilization", "deployment costs", "calibration",
+    "interpretability", "fine-tuning speed", "batch efficiency", "failure modes", "privacy guarantees",
+    "label noise", "power draw", "cold start times", "tail latency", "bandwidth needs", "convergence",
+    "sensor drift", "checkpoint sizes", "carbon footprint", "gradient variance", "cache hit rates",
+    "annotation costs", "numerical precision", "fault tolerance", "model size", "response quality"
+]
+CONTEXTS = [
+    "for long documents", "on commodity hardware", "in production systems", "across languages",
+    "at smaller scales", "for real-time workloads", "in recent benchmarks", "under tight budgets",
+    "for on-device use", "in open research", "across domains", "with limited data",
+    "in hospitals", "on factory floors", "in logistics networks", "for small teams", "at the edge",
+    "in regulated industries", "for scientific computing", "on mobile phones", "in data centers"
+]
+OPENERS = [
+    "Analyzing recent advances in", "New results on", "Recent work on", "Benchmarks of",
+    "Measurements of", "Ongoing research into", "Early deployments of", "Profiling",
+    "A closer look at", "Field data from", "Open-source releases of", "Ablation studies of"
+]
+CLOSERS = [
+    "The relationship between {a} and {b} continues to evolve.",
+    "Trade-offs between {a} and {b} are becoming clearer.",
+    "Teams now track {a} alongside {b}.",
+    "{A} increasingly depends on {b}.",
+    "Expect {a} to matter as much as {b} this year.",
+    "One team reports a {n}% gain in {a} with no loss in {b}.",
+    "{A} improved {n}x while {b} held steady.",
+    "Next milestone: {a} without sacrificing {b}."
+]
+
+def make_tweet(rng):
+    subject = rng.choice(SUBJECTS)
+    a, b = rng.sample(OBJECTS, 2)
+    first = (f"{rng.choice(OPENERS)} {subject} {rng.choice(VERBS)} {rng.choice(QUALIFIERS)} "
+             f"{rng.choice(OBJECTS)} {rng.choice(CONTEXTS)}.")
+    closer = rng.choice(CLOSERS).format(a=a, b=b, A=a.capitalize(), n=rng.randint(2, 60))
+    return f"{first} {closer}"
+
+def paraphrase(tweet, rng, keep=0.8):
+    """Drop and swap some words, the way a regenerated tweet echoes an old one."""
+    words = [word for word in tweet.split() if rng.random() < keep]
+    for _ in range(2):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(QUALIFIERS))
+    return " ".join(words)
+
+def pairwise_max(history, text):
+    """The original check: rebuild both word sets for every stored tweet."""
+    best = 0
+    for other in history:
+        set1, set2 = set(text.split()), set(other.split())
+        union = len(set1 | set2)
+        best = max(best, len(set1 & set2) / union if union > 0 else 0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    history = [make_tweet(rng) for _ in range(args.history)]
+    # Half the queries echo an old tweet, half are fresh
+    queries = [paraphrase(rng.choice(history), rng) if i % 2 else make_tweet(rng) for i in range(args.queries)]
+
+    index = NearDuplicateIndex(threshold=args.threshold, capacity=args.history)
+    start = time.perf_counter()
+    for tweet in history:
+        index.add(tweet)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_scores = [index.max_similarity(query) for query in queries]
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scan_scores = [
+        max((jaccard(index.features(query), entry[1]) for entry in index.entries.values()), default=0)
+        for query in queries
+    ]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        pairwise_max(history, query)
+    loop_time = time.perf_counter() - start
+
+    candidates = [len(index.candidates(index.band_keys(index.features(query)))) for query in queries]
+    expected = [score > args.threshold for score in scan_scores]
+    found = sum(1 for hit, score in zip(expected, index_scores) if hit and score > args.threshold)
+    echoes = index_scores[1::2]
+    caught = sum(1 for score in echoes if score > args.threshold)
+
+    print(f"history {args.history}, {args.queries} queries, threshold {args.threshold}, "
+          f"{index.bands} bands x {index.rows} rows")
+    print(f"  index build:        {build:.2f}s ({build / args.history * 1e3:.2f} ms per tweet)")
+    print(f"  candidates/query:   {sum(candidates) / len(candidates):.0f} "
+          f"({sum(candidates) / len(candidates) / args.history:.1%} of history)")
+    print(f"  LSH lookup:         {index_time / args.queries * 1e3:.2f} ms")
+    print(f"  full scan (same features): {scan_time / args.queries * 1e3:.2f} ms")
+    print(f"  original Jaccard loop:     {loop_time / args.queries * 1e3:.2f} ms")
+    print(f"  duplicate verdicts matching a full scan: {found}/{sum(expected)}")
+    print(f"  echoed tweets caught: {caught}/{len(echoes)}")
+    return 0 if found >= 0.9 * sum(expected) and caught == len(echoes) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Cold-start benchmark for telegram_bot.py.
+
+Imports the bot in fresh interpreters with `python -X importtime`, reports the
+median cumulative import time and exits non-zero when it exceeds the
+threshold, when an integration that should load lazily was imported, or when
+the import left files (databases, state, cache directories) behind.
+
+Usage:
+    python startup_benchmark.py [--runs 5] [--threshold-ms 2000]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Integrations that must only be imported on first use
+LAZY_MODULES = ('tweepy', 'fal_client', 'telebot', 'PIL', 'requests_oauthlib')
+
+CHECK_SCRIPT = (
+    "import sys, telegram_bot; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+def measure(module='telegram_bot'):
+    """Return (cumulative import time in ms, eagerly loaded lazy modules, files
+    created in the working directory) for one cold import."""
+    # The temp dir has no .env, and the bot builds its DeepSeek client at import
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+        DEEPSEEK_API_KEY=os.getenv('DEEPSEEK_API_KEY', 'benchmark')
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHECK_SCRIPT],
+            capture_output=True, text=True, env=env, cwd=workdir
+        )
+        created = os.listdir(workdir)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {result.returncode}")
+
+    import_ms = None
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and line.rstrip().endswith(f'| {module}'):
+            import_ms = int(line.split('|')[1]) / 1000
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return import_ms, loaded, created
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--threshold-ms', type=float, default=float(os.getenv('ORCA_STARTUP_THRESHOLD_MS', 2000)))
+    args = parser.parse_args()
+
+    timings = []
+    loaded = set()
+    created = set()
+    for _ in range(args.runs):
+        try:
+            import_ms, eager, files = measure()
+        except RuntimeError as e:
+            print(f"FAIL: telegram_bot import failed: {e}")
+            return 1
+        timings.append(import_ms)
+        loaded.update(eager)
+        created.update(files)
+
+    median = statistics.median(timings)
+    print(f"telegram_bot import: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"over {args.runs} runs (threshold {args.threshold_ms:.0f} ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(sorted(loaded))}")
+        failed = True
+    if created:
+        print(f"FAIL: import created: {', '.join(sorted(created))}")
+        failed = True
+    if median > args.threshold_ms:
+        print(f"FAIL: median import time above {args.threshold_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -245,7 +245,7 @@ class ChatInterface {
             this.isProcessing = true;
             await this.typeMessage(message, 'user');
             
-            const response = await fetch('/generate-response', {
+            const response = await fetch('/generate-response?stream=1', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -257,6 +257,13 @@ class ChatInterface {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
+            // Render tokens as they arrive when the server streams
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.includes('text/event-stream') && response.body) {
+                await this.streamMessage(response);
+                return;
+            }
+            
             const data = await response.json();
             if (data.status === 'error') {
                 throw new Error(data.response);
@@ -271,6 +278,43 @@ class ChatInterface {
         }
     }
 
+    async streamMessage(response) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot-message';
+        this.terminal.appendChild(messageDiv);
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            
+            for (const event of events) {
+                const line = event.split('\n').find(l => l.startsWith('data: '));
+                if (!line) continue;
+                
+                const data = JSON.parse(line.slice(6));
+                if (data.delta) {
+                    messageDiv.textContent += data.delta;
+                    this.terminal.scrollTop = this.terminal.scrollHeight;
+                }
+                if (data.status === 'error') {
+                    if (!messageDiv.textContent) {
+                        messageDiv.remove();
+                        throw new Error(data.response);
+                    }
+                    return;
+                }
+            }
+        }
+    }
+
     async typeMessage(text, sender) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -1,48 +1,55 @@
 import logging
 import os
 from telegram import Update
+from telegram.error import Forbidden, NetworkError, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from dotenv import load_dotenv
-from openai import OpenAI
-from collections import deque
+from orca_cache import create_cache_from_env, make_namespace, normalize_prompt
+from orca_intents import LINKS_TEXT, IntentRouter, default_intents
+from orca_llm import DEADLINES, acreate_completion
+from orca_memory import create_context_builder_from_env, create_store_from_env
+from orca_metrics import install_snapshot_signal, memory_snapshot, metrics, start_http_server
+from orca_similarity import NearDuplicateIndex
+from openai import AsyncOpenAI
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 import asyncio
 import random
+import re
 import traceback
 import tracemalloc
-import tweepy
-from PIL import Image
-from io import BytesIO
-import telebot
-import openai
 import time
 from pathlib import Path
-import requests
-from requests_oauthlib import OAuth1Session
-import fal_client
 import base64
-
-# Enable tracemalloc to track object allocation
-tracemalloc.start()
+import hashlib
+import httpx
+import json
+import sqlite3
 
 # Load environment variables
 load_dotenv()
 
+# Allocation tracing slows every allocation, so it is opt-in
+if os.getenv('ORCA_TRACEMALLOC', '').lower() in ('1', 'true', 'yes'):
+    tracemalloc.start()
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
-# Initialize OpenAI client with DeepSeek configuration
-client = OpenAI(
+# Initialize async OpenAI client with DeepSeek configuration so completions
+# never block the bot's event loop
+client = AsyncOpenAI(
     api_key=os.getenv('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com/v1"
+    base_url=os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com/v1")
 )
 
 # Initialize Twitter API v2
 def init_twitter():
     try:
+        import tweepy
         client = tweepy.Client(
             consumer_key=os.getenv('TWITTER_API_KEY'),
             consumer_secret=os.getenv('TWITTER_API_SECRET'),
@@ -54,23 +61,104 @@ def init_twitter():
         logging.error(f"Twitter initialization error: {e}")
         return None
 
-twitter_client = init_twitter()
+# Created on first use so importing the bot does not load tweepy
+twitter_client = None
 
-# After initializing twitter_client
-if twitter_client:
-    logging.info("Twitter client initialized successfully")
-else:
-    logging.error("Failed to initialize Twitter client")
+def get_twitter_client():
+    global twitter_client
+    if twitter_client is None:
+        twitter_client = init_twitter()
+        if twitter_client:
+            logging.info("Twitter client initialized successfully")
+        else:
+            logging.error("Failed to initialize Twitter client")
+    return twitter_client
+
+# Bounded conversation memory per user, trimmed to a prompt-token budget
+conversations = create_store_from_env()
+context_builder = create_context_builder_from_env()
+
+# Shared completion cache for repeated chat prompts ("hey orca", ...)
+completion_cache = create_cache_from_env()
+
+def write_json_atomic(path, data):
+    """Write JSON state via a temp file so a crash never leaves a truncated file."""
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(data))
+    tmp_path.replace(path)
+
+# Pictographic emoji blocks plus misc symbols/dingbats (✨, ☀, ...)
+EMOJI_RANGES = '\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F'
+
+class TextSanitizer:
+    """Single-pass text cleanup for one output channel.
+
+    Emoji-bearing words, hashtag words and banned phrases are compiled into one
+    regex alternation, so a message is scanned once instead of once per pattern.
+    """
+    def __init__(self, banned_phrases=(), emoji_words='contains', drop_hashtags=False, capitalize=True):
+        alternatives = []
+        if emoji_words == 'contains':
+            alternatives.append(rf'(?<!\S)\S*[{EMOJI_RANGES}]\S*')
+        elif emoji_words == 'prefix':
+            alternatives.append(rf'(?<!\S)[{EMOJI_RANGES}]\S*')
+        if drop_hashtags:
+            alternatives.append(r'(?<!\S)#\S*')
+        # Longest first so overlapping phrases ("*click* *click*" vs "*click*") match fully
+        alternatives.extend(re.escape(p) for p in sorted(set(banned_phrases), key=len, reverse=True))
+        pattern = '|'.join(alternatives)
+        # A first-character check lets the engine skip most positions cheaply; it
+        # cannot be used when an emoji may sit anywhere inside a word
+        if emoji_words != 'contains' and alternatives:
+            starts = {re.escape(p[0]) for p in banned_phrases if p}
+            if emoji_words == 'prefix':
+                starts.add(EMOJI_RANGES)
+            if drop_hashtags:
+                starts.add('#')
+            pattern = f"(?=[{''.join(sorted(starts))}])(?:{pattern})"
+        self.pattern = re.compile(pattern)
+        self.capitalize = capitalize
+
+    def clean(self, text):
+        cleaned = ' '.join(self.pattern.sub('', text).split())
+        if self.capitalize and cleaned:
+            cleaned = cleaned[0].upper() + cleaned[1:]
+        return cleaned
 
-# Conversation memory per user
-user_conversations = {}
+sanitizers = {
+    # X posts: strip the ocean persona entirely
+    'tweet': TextSanitizer([
+        "Did you know", "Just like", "dive into", "making waves", "swimming",
+        "splash", "*click*", "whale", "ocean", "#"
+    ]),
+    # Consciousness broadcasts to Telegram chats
+    'broadcast': TextSanitizer([
+        "*click* *click*", "Did you know", "Just like", "dive into",
+        "making waves", "swimming through", "#"
+    ], emoji_words='prefix'),
+    # Legacy tweepy posting path
+    'legacy': TextSanitizer([
+        "Did you know", "Just like", "dive into", "making waves", "swimming through",
+        "*click* *click*", "#AI", "#OceanIntelligence", "#OceanFacts"
+    ], drop_hashtags=True, capitalize=False),
+}
 
 class OrcaPersonality:
     def __init__(self):
-        self.last_tweets = set()
+        # Oldest-first history of posted tweets, indexed for near-duplicate lookups
+        self.last_tweets = NearDuplicateIndex(
+            threshold=0.25,
+            capacity=int(os.getenv('TWEET_HISTORY_SIZE', 150))
+        )
         self.tweet_patterns = set()
         self.used_themes = set()
         self.tweet_history = {}
+
+        # Candidates requested in parallel per round, and rounds before giving up
+        self.tweet_candidates = int(os.getenv('TWEET_CANDIDATES', 4))
+        self.tweet_rounds = 2
+        self.tweet_stats = {'candidates': 0, 'accepted': 0, 'generation_time': 0.0}
         self.themes = [
             "AI_ADVANCEMENT",
             "NEURAL_SYSTEMS",
@@ -126,51 +214,39 @@ Example formats:
 
 Key requirement: Each tweet must be uniquely engaging, showcase personality, and avoid technical jargon."""
 
-    def is_unique_tweet(self, new_tweet):
-        """Enhanced uniqueness checking"""
-        try:
-            new_tweet_lower = new_tweet.lower()
-            
-            # Stricter duplicate checks
-            if any(self.calculate_similarity(new_tweet_lower, old.lower()) > 0.25 
-                  for old in self.last_tweets):
-                return False
-            
-            # Check for common phrases that lead to similarity
-            common_phrases = [
-                "curious thought",
-                "symphony",
-                "consciousness is",
-                "wonder what",
-                "perhaps",
-                "melody",
-                "playing",
-                "resonating"
-            ]
-            
-            if any(phrase in new_tweet_lower for phrase in common_phrases):
-                return False
-            
-            # Store new tweet
-            self.last_tweets.add(new_tweet)
-            if len(self.last_tweets) > 150:
-                self.last_tweets.pop()
-            
-            return True
-            
-        except Exception as e:
-            logging.error(f"Error checking tweet uniqueness: {e}")
-            return False
+    def score_tweet(self, new_tweet):
+        """Score a tweet candidate locally; None means it must be rejected."""
+        if not new_tweet or len(new_tweet) > 280:
+            return None
 
-    def calculate_similarity(self, text1, text2):
-        """Calculate Jaccard similarity between two texts"""
-        set1 = set(text1.split())
-        set2 = set(text2.split())
-        
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        
-        return intersection / union if union > 0 else 0
+        new_tweet_lower = new_tweet.lower()
+
+        # Check for common phrases that lead to similarity
+        common_phrases = [
+            "curious thought",
+            "symphony",
+            "consciousness is",
+            "wonder what",
+            "perhaps",
+            "melody",
+            "playing",
+            "resonating"
+        ]
+
+        if any(phrase in new_tweet_lower for phrase in common_phrases):
+            return None
+
+        # Stricter duplicate checks
+        max_similarity = self.last_tweets.max_similarity(new_tweet)
+        if max_similarity > self.last_tweets.threshold:
+            return None
+
+        # Prefer the most novel candidate, then fuller use of the length limit
+        return (1 - max_similarity) + 0.2 * min(len(new_tweet), 240) / 240
+
+    def remember_tweet(self, new_tweet):
+        # The index evicts the oldest tweet once it is over capacity
+        self.last_tweets.add(new_tweet)
 
     async def generate_tweet(self):
         try:
@@ -189,11 +265,39 @@ Example good format:
 
 Current theme: {random.choice(self.themes)}"""
 
-            attempts = 0
-            max_attempts = 5
+            start = time.monotonic()
+            for _ in range(self.tweet_rounds):
+                candidates = await self.generate_tweet_candidates(tweet_prompt)
+                self.tweet_stats['candidates'] += len(candidates)
+
+                scored = [(self.score_tweet(c), c) for c in candidates]
+                scored = [(score, c) for score, c in scored if score is not None]
+                if scored:
+                    best = max(scored)[1]
+                    self.remember_tweet(best)
+                    self.tweet_stats['accepted'] += 1
+                    self.tweet_stats['generation_time'] += time.monotonic() - start
+                    logging.info(
+                        f"Tweet picked from {len(candidates)} candidates "
+                        f"({self.tweet_stats['candidates'] / self.tweet_stats['accepted']:.1f} candidates per accepted tweet)"
+                    )
+                    return best
+
+            return None
             
-            while attempts < max_attempts:
-                response = client.chat.completions.create(
+        except Exception as e:
+            logging.error(f"Error generating tweet: {e}")
+            return None
+
+    async def generate_tweet_candidates(self, tweet_prompt):
+        """Request several tweet candidates in parallel and return the usable texts."""
+        # Candidates are meant to differ, so these deliberately bypass request coalescing
+        with metrics.timer('tweet_candidates'):
+            responses = await asyncio.gather(*(
+                acreate_completion(
+                    client,
+                    deadline=DEADLINES['background'],
+                    coalesce=False,
                     model="deepseek-chat",
                     messages=[
                         {"role": "system", "content": self.system_prompt},
@@ -202,36 +306,41 @@ Current theme: {random.choice(self.themes)}"""
                     max_tokens=100,
                     temperature=0.75  # Reduced temperature for more focused outputs
                 )
-                
-                message = response.choices[0].message.content.strip()
-                
-                if len(message) > 280:
-                    attempts += 1
-                    continue
-                
-                if message and self.is_unique_tweet(message):
-                    return message
-                
-                attempts += 1
-            
-            return None
-            
-        except Exception as e:
-            logging.error(f"Error generating tweet: {e}")
-            return None
-
-    async def generate_message(self, message):
+                for _ in range(self.tweet_candidates)
+            ), return_exceptions=True)
+
+        candidates = []
+        for response in responses:
+            if isinstance(response, Exception):
+                logging.error(f"Error generating tweet candidate: {response}")
+                continue
+            candidates.append(response.choices[0].message.content.strip())
+        return candidates
+
+    async def generate_message(self, message, history=None):
         try:
-            response = client.chat.completions.create(
+            # Only context-free prompts are safe to answer from the cache
+            namespace = make_namespace(self.system_prompt, model="deepseek-chat", max_tokens=150, temperature=0.85)
+            if not history:
+                cached = completion_cache.get(namespace, message)
+                if cached:
+                    return cached
+
+            messages, prompt_tokens = context_builder.build(self.system_prompt, history or [], message)
+            response = await acreate_completion(
+                client,
+                deadline=DEADLINES['interactive'],
                 model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": message}
-                ],
+                messages=messages,
                 max_tokens=150,
                 temperature=0.85
             )
-            return response.choices[0].message.content
+            usage = getattr(response, 'usage', None)
+            logging.info(f"Prompt tokens: estimated {prompt_tokens}, reported {getattr(usage, 'prompt_tokens', None)}")
+            content = response.choices[0].message.content
+            if not history:
+                completion_cache.set(namespace, message, content)
+            return content
         except Exception as e:
             logging.error(f"Error generating message: {e}")
             return None
@@ -239,9 +348,314 @@ Current theme: {random.choice(self.themes)}"""
 # Initialize Orca personality
 orca = OrcaPersonality()
 
+class TokenBucket:
+    """Async token bucket refilling `rate` tokens per second up to `capacity`."""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def pause(self, seconds):
+        """Hold all acquisitions for `seconds` (e.g. a Telegram retry_after)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def try_acquire(self):
+        """Take a token without waiting; False if none is available."""
+        now = self.refill()
+        if now < self.blocked_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self.refill()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdmissionController:
+    """Decide which "orca" mentions get a DeepSeek reply.
+
+    Every mention needs a token from its user's and its chat's bucket; users
+    and chats over their rate are ignored so one noisy group cannot drain the
+    budget for everyone else. Mentions answered locally stop there, and only
+    those headed for DeepSeek take a global token. They wait for one of
+    `concurrency` generation slots, and once `max_pending` are queued or
+    running, further mentions are shed with a canned reply instead.
+    """
+    SHED_REPLIES = [
+        "*click* *click* The pod is swamped right now... ask me again in a minute! 🌊",
+        "*splash* Too many fish in the sea at once! Give me a moment and try again. 🐋",
+        "[Surfacing for air...] I'm juggling a lot of waves, try me again shortly!"
+    ]
+
+    def __init__(self, user_rate=6 / 60, user_burst=3, chat_rate=20 / 60, chat_burst=5,
+                 global_rate=5, global_burst=10, concurrency=8, max_pending=32, max_keys=10000):
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.user_buckets = OrderedDict()
+        self.chat_buckets = OrderedDict()
+        self.max_keys = max_keys
+        self.slots = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.stats = {'admitted': 0, 'throttled': 0, 'shed': 0}
+
+    def bucket(self, buckets, key, rate, burst):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        buckets.move_to_end(key)
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+        return bucket
+
+    def allow(self, user_id, chat_id):
+        """Apply the user and chat rates; False means ignore the mention quietly."""
+        user_bucket = self.bucket(self.user_buckets, user_id, self.user_rate, self.user_burst)
+        if not user_bucket.try_acquire():
+            self.stats['throttled'] += 1
+            return False
+        chat_bucket = self.bucket(self.chat_buckets, chat_id, self.chat_rate, self.chat_burst)
+        if not chat_bucket.try_acquire():
+            user_bucket.refund()
+            self.stats['throttled'] += 1
+            return False
+        return True
+
+    def reserve(self):
+        """Take a global token for a DeepSeek reply; False means shed (send a canned reply)."""
+        if self.pending >= self.max_pending or not self.global_bucket.try_acquire():
+            self.stats['shed'] += 1
+            return False
+        self.stats['admitted'] += 1
+        return True
+
+    def shed_reply(self):
+        return random.choice(self.SHED_REPLIES)
+
+    async def run(self, coro_fn):
+        """Run an admitted generation once a slot frees up."""
+        self.pending += 1
+        try:
+            async with self.slots:
+                return await coro_fn()
+        finally:
+            self.pending -= 1
+
+admission = AdmissionController(
+    user_rate=float(os.getenv('ORCA_USER_RATE_PER_MIN', 6)) / 60,
+    chat_rate=float(os.getenv('ORCA_CHAT_RATE_PER_MIN', 20)) / 60,
+    global_rate=float(os.getenv('ORCA_GLOBAL_RATE', 5)),
+    concurrency=int(os.getenv('ORCA_REPLY_CONCURRENCY', 8)),
+    max_pending=int(os.getenv('ORCA_REPLY_QUEUE_SIZE', 32))
+)
+
+# Trivial intents answered without DeepSeek
+intent_router = IntentRouter(default_intents())
+
+# Whole-word "orca", "orcaai" or "orca ai" (so "orchestra" or "orcas" do not trigger a reply)
+ORCA_TRIGGER = re.compile(r"\borca(?:\s?ai)?\b", re.IGNORECASE)
+
+class BroadcastEngine:
+    """Concurrent fan-out of one message to many chats within Telegram's rate limits.
+
+    Telegram allows roughly 30 messages per second per bot and 20 per minute
+    per group, so sends go through a global bucket and a per-chat bucket,
+    with at most `max_concurrency` requests in flight.
+    """
+    def __init__(self, max_concurrency=20, global_rate=30, chat_rate=20 / 60, max_retries=3):
+        self.max_concurrency = max_concurrency
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self.max_retries = max_retries
+        self.chat_stats = {}
+
+    def chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+        return bucket
+
+    def record(self, chat_id, latency=None, error=None):
+        stats = self.chat_stats.setdefault(chat_id, {
+            'sent': 0, 'failed': 0, 'total_latency': 0.0, 'last_latency': None, 'last_error': None
+        })
+        if error is None:
+            stats['sent'] += 1
+            stats['total_latency'] += latency
+            stats['last_latency'] = latency
+        else:
+            stats['failed'] += 1
+            stats['last_error'] = str(error)
+
+    async def send(self, bot, chat_id, text, semaphore):
+        """Send to one chat with retry-after and transient-error retries. Returns the error or None."""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.chat_bucket(chat_id).acquire()
+                await self.global_bucket.acquire()
+                start = time.monotonic()
+                try:
+                    with metrics.timer('telegram_send'):
+                        await bot.send_message(chat_id=chat_id, text=text)
+                    self.record(chat_id, latency=time.monotonic() - start)
+                    return None
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else retry_after
+                    logging.warning(f"Flood control on chat {chat_id}, pausing sends for {seconds}s")
+                    self.global_bucket.pause(seconds)
+                    error = e
+                except Forbidden as e:
+                    error = e
+                    break
+                except NetworkError as e:
+                    error = e
+                    await asyncio.sleep(min(2 ** attempt, 30) + random.random())
+                except Exception as e:
+                    error = e
+                    break
+
+            self.record(chat_id, error=error)
+            return error
+
+    async def broadcast(self, bot, chat_ids, text):
+        """Send text to every chat concurrently. Returns {chat_id: error or None}."""
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chat_ids = list(chat_ids)
+        errors = await asyncio.gather(*(self.send(bot, chat_id, text, semaphore) for chat_id in chat_ids))
+        results = dict(zip(chat_ids, errors))
+
+        failed = sum(1 for error in errors if error is not None)
+        logging.info(
+            f"Broadcast to {len(chat_ids)} chats finished in {time.monotonic() - start:.2f}s "
+            f"({len(chat_ids) - failed} sent, {failed} failed)"
+        )
+        return results
+
+class ChatRegistry:
+    """Durable registry of chats the bot broadcasts to.
+
+    Chats live in a local SQLite table and are batch-loaded into memory at
+    startup, so membership checks are O(1) dict lookups. Each chat tracks
+    its last successful send and consecutive failures; chats that are dead
+    (bot removed or blocked) or keep failing are pruned so broadcasts never
+    waste calls on them.
+    """
+    def __init__(self, path="orca_chats.db", seed_chats=(), max_failures=5, max_idle_days=30):
+        self.max_failures = max_failures
+        self.max_idle = max_idle_days * 86400
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chats (
+                chat_id INTEGER PRIMARY KEY,
+                added_at REAL NOT NULL,
+                last_success REAL,
+                failures INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO chats (chat_id, added_at) VALUES (?, ?)",
+            [(chat_id, now) for chat_id in seed_chats]
+        )
+        self.conn.commit()
+
+        # chat_id -> [added_at, last_success, failures]
+        self.chats = {
+            chat_id: [added_at, last_success, failures]
+            for chat_id, added_at, last_success, failures in self.conn.execute(
+                "SELECT chat_id, added_at, last_success, failures FROM chats"
+            )
+        }
+        logging.info(f"Loaded {len(self.chats)} known chats")
+
+    def __contains__(self, chat_id):
+        return chat_id in self.chats
+
+    def __iter__(self):
+        return iter(list(self.chats))
+
+    def __len__(self):
+        return len(self.chats)
+
+    def add(self, chat_id):
+        if chat_id in self.chats:
+            return
+        now = time.time()
+        self.chats[chat_id] = [now, None, 0]
+        self.conn.execute("INSERT OR IGNORE INTO chats (chat_id, added_at) VALUES (?, ?)", (chat_id, now))
+        self.conn.commit()
+
+    def discard(self, chat_id):
+        if self.chats.pop(chat_id, None) is not None:
+            self.conn.execute("DELETE FROM chats WHERE chat_id = ?", (chat_id,))
+            self.conn.commit()
+
+    def record_results(self, results):
+        """Persist one broadcast's {chat_id: error or None} outcome in a single transaction."""
+        now = time.time()
+        succeeded, failed = [], []
+        for chat_id, error in results.items():
+            entry = self.chats.get(chat_id)
+            if entry is None:
+                continue
+            if error is None:
+                entry[1], entry[2] = now, 0
+                succeeded.append((now, chat_id))
+            else:
+                entry[2] += 1
+                failed.append((chat_id,))
+        self.conn.executemany("UPDATE chats SET last_success = ?, failures = 0 WHERE chat_id = ?", succeeded)
+        self.conn.executemany("UPDATE chats SET failures = failures + 1 WHERE chat_id = ?", failed)
+        self.conn.commit()
+
+    def prune(self):
+        """Drop chats that failed max_failures times in a row, or are failing with no success in max_idle_days."""
+        now = time.time()
+        stale = [
+            chat_id for chat_id, (added_at, last_success, failures) in self.chats.items()
+            if failures >= self.max_failures
+            or (failures and now - (last_success or added_at) > self.max_idle)
+        ]
+        for chat_id in stale:
+            del self.chats[chat_id]
+        if stale:
+            self.conn.executemany("DELETE FROM chats WHERE chat_id = ?", [(chat_id,) for chat_id in stale])
+            self.conn.commit()
+            logging.info(f"Pruned {len(stale)} dead chats from known chats")
+        return stale
+
 class OrcaConsciousness:
     def __init__(self):
-        self.known_chats = {-1002179640252}
+        self.known_chats = None  # ChatRegistry, opened on first use
+        self.broadcaster = BroadcastEngine(
+            max_concurrency=int(os.getenv('BROADCAST_CONCURRENCY', 20)),
+            global_rate=float(os.getenv('BROADCAST_RATE', 30))
+        )
         self.last_message = None
         self.used_themes = set()
         self.message_count = 0
@@ -279,12 +693,22 @@ class OrcaConsciousness:
 
 Key focus: Generate completely unique content each time, never repeating patterns or structures."""
 
+    def chats(self):
+        """The chat registry, opened on first use so importing the bot touches no files."""
+        if self.known_chats is None:
+            self.known_chats = ChatRegistry(
+                os.getenv('ORCA_CHATS_PATH', 'orca_chats.db'),
+                seed_chats=[-1002179640252]
+            )
+        return self.known_chats
+
     async def add_chat(self, chat_id):
         """Add a new chat to known_chats"""
-        if chat_id not in self.known_chats:
-            self.known_chats.add(chat_id)
+        known_chats = self.chats()
+        if chat_id not in known_chats:
+            known_chats.add(chat_id)
             logging.info(f"Added new chat {chat_id} to known chats")
-        return chat_id in self.known_chats
+        return chat_id in known_chats
 
     async def generate_consciousness_message(self):
         try:
@@ -313,7 +737,9 @@ Focus on:
 - Research developments
 - Future implications"""
 
-            response = client.chat.completions.create(
+            response = await acreate_completion(
+                client,
+                deadline=DEADLINES['background'],
                 model="deepseek-chat",
                 messages=[
                     {"role": "system", "content": self.system_prompt},
@@ -332,29 +758,7 @@ Focus on:
 
     def post_process_message(self, message):
         """Clean and enhance the message"""
-        # Remove common patterns
-        patterns_to_remove = [
-            '*click* *click*',
-            'Did you know',
-            'Just like',
-            'dive into',
-            'making waves',
-            'swimming through',
-            '#'
-        ]
-        
-        for pattern in patterns_to_remove:
-            message = message.replace(pattern, '')
-        
-        # Remove emojis
-        message = ' '.join(word for word in message.split() if not word.startswith(('🐋', '🌊', '🐳', '🔬', '🤖', '💡')))
-        
-        # Clean up and capitalize
-        message = message.strip()
-        if message:
-            message = message[0].upper() + message[1:]
-        
-        return message
+        return sanitizers['broadcast'].clean(message)
 
     def get_fallback_message(self):
         """Generate a fallback message if API fails"""
@@ -368,29 +772,145 @@ Focus on:
         return random.choice(fallbacks)
 
     async def post_to_all_chats(self, bot):
-        if not self.known_chats:
+        known_chats = self.chats()
+        if not known_chats:
             logging.info("No known chats to post to")
             return
 
         try:
-            # Generate dynamic message
-            message = await self.generate_consciousness_message()
+            # Fall back to a canned message if DeepSeek is down
+            message = await self.generate_consciousness_message() or self.get_fallback_message()
             
-            for chat_id in list(self.known_chats):
-                try:
-                    await bot.send_message(chat_id=chat_id, text=message)
-                    logging.info(f"Posted consciousness to chat {chat_id}")
-                except Exception as e:
-                    logging.error(f"Error posting to chat {chat_id}: {str(e)}")
-                    if "chat not found" in str(e).lower() or "blocked" in str(e).lower():
-                        self.known_chats.remove(chat_id)
-                        logging.info(f"Removed chat {chat_id} from known chats")
+            results = await self.broadcaster.broadcast(bot, known_chats, message)
+            known_chats.record_results(results)
+            failed = sum(1 for error in results.values() if error is not None)
+            metrics.inc('broadcast_messages', len(results) - failed, outcome='sent')
+            metrics.inc('broadcast_messages', failed, outcome='failed')
+            for chat_id, error in results.items():
+                if error is None:
+                    continue
+                logging.error(f"Error posting to chat {chat_id}: {str(error)}")
+                if isinstance(error, Forbidden) or "chat not found" in str(error).lower() or "blocked" in str(error).lower():
+                    known_chats.discard(chat_id)
+                    logging.info(f"Removed chat {chat_id} from known chats")
+            known_chats.prune()
         except Exception as e:
             logging.error(f"Error in consciousness posting: {str(e)}")
 
 # Create global consciousness instance
 consciousness = OrcaConsciousness()
 
+class ContentBuffer:
+    """Bounded, persisted buffer of ready-to-post tweets.
+
+    A background job tops the buffer up during quiet periods, so scheduled
+    X posts only dequeue. Items are cleaned and uniqueness-checked when they
+    are produced and expire after max_age seconds. Consciousness broadcasts
+    are not scheduled, so they are generated when sent rather than buffered.
+    """
+    def __init__(self, path="orca_content_buffer.json", target_size=4, max_age=12 * 3600, quiet_period=30):
+        self.path = Path(path)
+        self.target_size = target_size
+        self.max_age = max_age
+        self.quiet_period = quiet_period
+        self.last_activity = 0.0
+        self.items = {'tweet': deque()}
+        self.refilling = False
+        self.load()
+
+    def load(self):
+        try:
+            state = json.loads(self.path.read_text())
+            for kind, items in state.items():
+                if kind in self.items:
+                    self.items[kind].extend(tuple(item) for item in items)
+            self.expire()
+            # Keep restarted history aware of tweets that are queued but not yet posted
+            for text, _ in self.items.get('tweet', ()):
+                orca.remember_tweet(text)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Error loading content buffer: {e}")
+
+    def save(self):
+        try:
+            write_json_atomic(self.path, {kind: list(items) for kind, items in self.items.items()})
+        except Exception as e:
+            logging.error(f"Error saving content buffer: {e}")
+
+    def expire(self):
+        cutoff = time.time() - self.max_age
+        for items in self.items.values():
+            while items and items[0][1] < cutoff:
+                items.popleft()
+
+    def note_activity(self):
+        self.last_activity = time.monotonic()
+
+    def pop(self, kind):
+        """Dequeue the oldest ready item of a kind, or None when empty."""
+        self.expire()
+        items = self.items.get(kind)
+        if not items:
+            if items is not None:
+                logging.info(f"Content buffer empty for {kind}, generating inline")
+            return None
+        text, _ = items.popleft()
+        self.save()
+        return text
+
+    def requeue(self, kind, text):
+        """Put an item that could not be posted back at the front of its queue."""
+        self.items[kind].appendleft((text, time.time()))
+        self.save()
+
+    async def produce(self, kind):
+        text = await orca.generate_tweet()
+        return sanitizers['tweet'].clean(text) if text else None
+
+    async def refill(self, context=None):
+        """Top every kind up to target_size; deferred while chats are busy unless a kind is empty."""
+        if self.refilling:
+            return
+        self.refilling = True
+        try:
+            self.expire()
+            busy = time.monotonic() - self.last_activity < self.quiet_period
+            for kind, items in self.items.items():
+                if busy and items:
+                    continue
+                start = time.monotonic()
+                added = 0
+                while len(items) < self.target_size:
+                    text = await self.produce(kind)
+                    if not text:
+                        break
+                    items.append((text, time.time()))
+                    added += 1
+                if added:
+                    self.save()
+                    logging.info(
+                        f"Content buffer: generated {added} {kind} item(s) in {time.monotonic() - start:.1f}s "
+                        f"({len(items)}/{self.target_size} ready)"
+                    )
+        except Exception as e:
+            logging.error(f"Error refilling content buffer: {e}")
+        finally:
+            self.refilling = False
+
+# Created on first use so importing the bot does not read buffer state
+content_buffer = None
+
+def get_content_buffer():
+    global content_buffer
+    if content_buffer is None:
+        content_buffer = ContentBuffer(
+            os.getenv('ORCA_CONTENT_BUFFER_PATH', 'orca_content_buffer.json'),
+            target_size=int(os.getenv('ORCA_CONTENT_BUFFER_SIZE', 4))
+        )
+    return content_buffer
+
 async def generate_welcome_message(client):
     """Generate a dynamic welcome message using DeepSeek."""
     try:
@@ -404,7 +924,9 @@ async def generate_welcome_message(client):
             "Keep it under 200 tokens and make it engaging!"
         )
 
-        response = await client.chat.completions.create(
+        response = await acreate_completion(
+            client,
+            deadline=DEADLINES['interactive'],
             model="deepseek-chat",
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -460,22 +982,17 @@ Simply mention "Orca" or "Hey Orca" in your message to get my attention!"""
 
 async def links_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send social media links."""
-    links_text = """🌊 *Follow OrcaAI*
-
-X: https://x.com/orcaaiseek
-GitHub: https://github.com/spartansfighthard/orcaAI
-Telegram: https://t.me/OrcaAiportal
-
-Join our pod! 🐋"""
-    
-    await update.message.reply_text(links_text, parse_mode='Markdown')
+    await update.message.reply_text(LINKS_TEXT, parse_mode='Markdown')
 
 async def clear(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Clear conversation history for user."""
     user_id = update.effective_user.id
-    user_conversations[user_id] = deque(maxlen=5)
+    conversations.clear(user_id)
     await update.message.reply_text("MEMORY BANKS CLEARED... STARTING FRESH ANALYSIS OF YOUR EXISTENCE.")
 
+MESSAGE_FALLBACK = "*click* *click* Something's not swimming right... Let me catch my breath!"
+
+@metrics.timed('telegram_handler', handler='message')
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle incoming messages."""
     try:
@@ -484,17 +1001,44 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
             
         message = update.message.text.lower() if update.message.text else ""
+        get_content_buffer().note_activity()
         
         # Check if message is an Orca command
-        if any(cmd in message for cmd in ['orca', 'hey orca']):
-            response = await orca.generate_message(message)
+        if ORCA_TRIGGER.search(message):
+            user_id = update.effective_user.id if update.effective_user else update.effective_chat.id
+            if not admission.allow(user_id, update.effective_chat.id):
+                metrics.inc('mentions', outcome='throttled')
+                return
+
+            # "hey orca", links and fact requests are answered from templates
+            local_reply = intent_router.answer(message)
+            if local_reply:
+                metrics.inc('mentions', outcome='local')
+                await update.message.reply_text(local_reply, parse_mode='Markdown' if local_reply == LINKS_TEXT else None)
+                return
+
+            # Only mentions headed for DeepSeek use the global budget
+            if not admission.reserve():
+                metrics.inc('mentions', outcome='shed')
+                await update.message.reply_text(admission.shed_reply())
+                return
+
+            response = await admission.run(lambda: orca.generate_message(message, conversations.history(user_id)))
+            if not response:
+                # DeepSeek failed or its circuit is open
+                metrics.inc('mentions', outcome='fallback')
+                await update.message.reply_text(MESSAGE_FALLBACK)
+                return
+            metrics.inc('mentions', outcome='upstream')
             await update.message.reply_text(response)
+            if response:
+                conversations.append(user_id, message, response)
             
     except Exception as e:
         logging.error(f"Error in message handling: {str(e)}")
         # Add check for None message before replying
         if update and update.message:
-            await update.message.reply_text("*click* *click* Something's not swimming right... Let me catch my breath!")
+            await update.message.reply_text(MESSAGE_FALLBACK)
 
 async def post_consciousness(context: ContextTypes.DEFAULT_TYPE):
     try:
@@ -503,13 +1047,10 @@ async def post_consciousness(context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logging.error(f"Error in message posting: {str(e)}")
 
-# Initialize Telegram bot
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-bot = telebot.TeleBot(TELEGRAM_TOKEN)
-
 def load_twitter_credentials():
     """Load and validate Twitter API credentials"""
     try:
+        from requests_oauthlib import OAuth1Session
         auth = OAuth1Session(
             client_key=os.getenv('TWITTER_API_KEY'),
             client_secret=os.getenv('TWITTER_API_SECRET'),
@@ -522,6 +1063,101 @@ def load_twitter_credentials():
         logging.error(f"Error loading Twitter credentials: {e}")
         return None
 
+class PostingQuota:
+    """Persistent token bucket and backoff state for X posting.
+
+    Slots refill at daily_limit per day (up to `burst` banked slots). Failed
+    posts back off exponentially with jitter, and X's x-rate-limit-reset
+    headers block posting until the reported reset time. State is saved to a
+    small JSON file so restarts cannot reset the quota.
+    """
+    def __init__(self, path="orca_x_quota.json", daily_limit=48, burst=2,
+                 base_backoff=30, max_backoff=1800):
+        self.path = Path(path)
+        self.rate = daily_limit / 86400
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.tokens = burst
+        self.updated = time.time()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.load()
+
+    def load(self):
+        try:
+            state = json.loads(self.path.read_text())
+            self.tokens = state['tokens']
+            self.updated = state['updated']
+            self.blocked_until = state['blocked_until']
+            self.failures = state['failures']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Error loading X posting quota: {e}")
+
+    def save(self):
+        try:
+            write_json_atomic(self.path, {
+                'tokens': self.tokens,
+                'updated': self.updated,
+                'blocked_until': self.blocked_until,
+                'failures': self.failures
+            })
+        except Exception as e:
+            logging.error(f"Error saving X posting quota: {e}")
+
+    def refill(self):
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def try_acquire(self):
+        """Reserve a posting slot; False if over quota or backing off."""
+        now = self.refill()
+        if now < self.blocked_until:
+            logging.info(f"X posting blocked for another {self.blocked_until - now:.0f}s")
+            return False
+        if self.tokens < 1:
+            logging.info(f"X daily quota reached, next slot in {(1 - self.tokens) / self.rate:.0f}s")
+            return False
+        self.tokens -= 1
+        self.save()
+        return True
+
+    def refund(self):
+        """Return an unused slot (the post never reached X)."""
+        self.refill()
+        self.tokens = min(self.burst, self.tokens + 1)
+        self.save()
+
+    def apply_rate_limit_headers(self, response):
+        headers = response.headers
+        for remaining_header, reset_header in (
+            ('x-rate-limit-remaining', 'x-rate-limit-reset'),
+            ('x-user-limit-24hour-remaining', 'x-user-limit-24hour-reset'),
+        ):
+            reset = headers.get(reset_header)
+            if reset and (response.status_code == 429 or headers.get(remaining_header) == '0'):
+                self.blocked_until = max(self.blocked_until, float(reset))
+
+    def record_success(self, response):
+        self.failures = 0
+        self.apply_rate_limit_headers(response)
+        self.save()
+
+    def record_failure(self, response=None):
+        """Back off exponentially with jitter; returns the delay in seconds."""
+        self.failures += 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+        delay *= random.uniform(0.5, 1.5)
+        self.blocked_until = max(self.blocked_until, time.time() + delay)
+        if response is not None:
+            self.apply_rate_limit_headers(response)
+        self.save()
+        return self.blocked_until - time.time()
+
 class XIntegration:
     def __init__(self, bot):
         self.bot = bot
@@ -530,64 +1166,108 @@ class XIntegration:
         self.daily_limit = 48
         self.last_reset = datetime.now()
         self.last_tweet = None
-        self.auth = load_twitter_credentials()
+        self.auth = None  # OAuth session, loaded on the first post
+        self.quota = PostingQuota(
+            os.getenv('ORCA_X_QUOTA_PATH', 'orca_x_quota.json'),
+            daily_limit=self.daily_limit
+        )
+        self.post_stats = {'posted': 0, 'total_time': 0.0}
 
     async def post_scheduled_tweet(self, context):
         try:
+            start = time.monotonic()
             attempts = 0
-            max_attempts = 5
-            
-            while attempts < max_attempts:
-                # Generate tweet using OrcaPersonality
+            max_attempts = 3
+
+            # Only spend a DeepSeek call once a posting slot is guaranteed
+            if not self.quota.try_acquire():
+                return False
+
+            if self.auth is None:
+                self.auth = load_twitter_credentials()
+                if self.auth is None:
+                    self.quota.refund()
+                    return False
+
+            # Buffered tweets are already cleaned and uniqueness-checked
+            tweet_text = get_content_buffer().pop('tweet')
+            buffered = tweet_text is not None
+            if not tweet_text:
+                # Candidates are generated and filtered in parallel, so one call either
+                # yields a usable tweet or the whole slot is skipped
                 tweet_text = await orca.generate_tweet()
                 if not tweet_text:
                     logging.error("Failed to generate tweet text")
-                    attempts += 1
-                    continue
+                    self.quota.refund()
+                    return False
 
                 # Clean tweet before posting
                 tweet_text = self.clean_tweet_for_posting(tweet_text)
-                
+            
+            while attempts < max_attempts:
+                attempts += 1
+                status_response = None
                 # Post to Twitter
                 try:
                     tweets_url = 'https://api.twitter.com/2/tweets'
                     tweet_data = {'text': tweet_text}
                     
-                    status_response = self.auth.post(
-                        tweets_url,
-                        json=tweet_data
-                    )
-                    
-                    if status_response.status_code != 201:
-                        logging.error(f"Tweet posting failed: {status_response.text}")
-                        attempts += 1
-                        continue
-                    
-                    tweet_id = status_response.json()['data']['id']
+                    # requests is blocking, so post from a worker thread
+                    with metrics.timer('x_post'):
+                        status_response = await asyncio.to_thread(
+                            self.auth.post,
+                            tweets_url,
+                            json=tweet_data
+                        )
                     
-                    # Update notification format
-                    message = f"""New AI Technology Update:
+                    if status_response.status_code == 201:
+                        break
+                    logging.error(f"Tweet posting failed: {status_response.text}")
+                except Exception as e:
+                    logging.error(f"Error posting tweet: {str(e)}")
+
+                delay = self.quota.record_failure(status_response)
+                # Give up on this slot rather than wait out a long rate-limit reset
+                if attempts >= max_attempts or delay > self.quota.max_backoff:
+                    logging.error(f"Failed to post tweet after {attempts} attempts")
+                    metrics.inc('x_posts', outcome='failed')
+                    self.quota.refund()
+                    if buffered:
+                        # Keep the ready tweet for the next slot
+                        get_content_buffer().requeue('tweet', tweet_text)
+                    return False
+                await asyncio.sleep(delay)
+
+            self.quota.record_success(status_response)
+            metrics.inc('x_posts', outcome='posted')
+            self.tweet_count += 1
+            tweet_id = status_response.json()['data']['id']
+            
+            # Update notification format
+            message = f"""New AI Technology Update:
 
 {tweet_text}
 
 View on X: https://x.com/orcaaiseek/status/{tweet_id}"""
 
-                    await context.bot.send_message(
-                        chat_id=self.supergroup_id,
-                        text=message,
-                        disable_web_page_preview=False
-                    )
-                    
-                    logging.info(f"Tweet {tweet_id} posted successfully")
-                    return True
-                    
-                except Exception as e:
-                    logging.error(f"Error posting tweet: {str(e)}")
-                    attempts += 1
-                    continue
-
-            logging.error(f"Failed to post tweet after {max_attempts} attempts")
-            return False
+            # The tweet is already live, so a failed notification must not re-post it
+            try:
+                await context.bot.send_message(
+                    chat_id=self.supergroup_id,
+                    text=message,
+                    disable_web_page_preview=False
+                )
+            except Exception as e:
+                logging.error(f"Error notifying supergroup of tweet {tweet_id}: {str(e)}")
+            
+            elapsed = time.monotonic() - start
+            self.post_stats['posted'] += 1
+            self.post_stats['total_time'] += elapsed
+            logging.info(
+                f"Tweet {tweet_id} posted successfully in {elapsed:.1f}s "
+                f"(avg {self.post_stats['total_time'] / self.post_stats['posted']:.1f}s per posted tweet)"
+            )
+            return True
 
         except Exception as e:
             logging.error(f"Error in post_scheduled_tweet: {str(e)}")
@@ -595,38 +1275,7 @@ View on X: https://x.com/orcaaiseek/status/{tweet_id}"""
 
     def clean_tweet_for_posting(self, text):
         """Final cleanup of tweet text"""
-        # Remove common patterns
-        banned_patterns = [
-            "Did you know",
-            "Just like",
-            "dive into",
-            "making waves",
-            "swimming",
-            "splash",
-            "*click*",
-            "whale",
-            "ocean",
-            "🐋", "🌊", "🎶", "✨",
-            "#"
-        ]
-        
-        cleaned = text
-        for pattern in banned_patterns:
-            cleaned = cleaned.replace(pattern, "")
-        
-        # Remove emojis and hashtags
-        cleaned = ' '.join(
-            word for word in cleaned.split() 
-            if not any(char in word for char in ['🐋', '🌊', '🎶', '✨', '🐳', '🔬', '🤖', '💡'])
-            and not word.startswith('#')
-        )
-        
-        # Final formatting
-        cleaned = cleaned.strip()
-        if cleaned:
-            cleaned = cleaned[0].upper() + cleaned[1:]
-        
-        return cleaned
+        return sanitizers['tweet'].clean(text)
 
 # Add handler for new chat members
 async def handle_new_chat_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -674,7 +1323,7 @@ Follow my pod on X: https://x.com/orcaaiseek 🌊
                 
                 # Also log to supergroup if it exists
                 try:
-                    if -1002179640252 in consciousness.known_chats:
+                    if -1002179640252 in consciousness.chats():
                         notification = f"""🤖 Orca added to new chat:
 Type: {chat_type}
 Title: {chat_title}
@@ -754,31 +1403,10 @@ class OrcaImageGenerator:
     async def generate_image(self, prompt=None):
         try:
             if not prompt:
-                # Generate an AI-themed prompt if none provided
-                response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": "Generate a detailed prompt for an AI-themed image."}
-                    ],
-                    max_tokens=100,
-                    temperature=0.7
-                )
-                prompt = response.choices[0].message.content.strip()
+                # Use a pre-expanded AI-themed prompt, expanding inline only if the pool is dry
+                prompt = prompt_pool.take() or await self.expand_prompt()
 
-            # Updated Janus API call using fal_client
-            result = fal_client.subscribe(
-                "fal-ai/janus",
-                arguments={
-                    "prompt": prompt,
-                    "image_size": "square_hd",
-                    "temperature": 0.8,
-                    "cfg_weight": 7,
-                    "num_images": 1,
-                    "enable_safety_checker": True
-                },
-                with_logs=True
-            )
+            result = await self.render(prompt)
 
             return {
                 "image_url": result["images"][0]["url"],
@@ -789,9 +1417,408 @@ class OrcaImageGenerator:
             logging.error(f"Error generating image: {e}")
             return None
 
+    async def expand_prompt(self):
+        """Generate an AI-themed image prompt"""
+        response = await acreate_completion(
+            client,
+            deadline=DEADLINES['interactive'],
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": "Generate a detailed prompt for an AI-themed image."}
+            ],
+            max_tokens=100,
+            temperature=0.7
+        )
+        return response.choices[0].message.content.strip()
+
+    async def render(self, prompt):
+        """Render a prompt with Janus; FAL_ENDPOINT_URL points at a local stub for offline load tests."""
+        arguments = {
+            "prompt": prompt,
+            "image_size": "square_hd",
+            "temperature": 0.8,
+            "cfg_weight": 7,
+            "num_images": 1,
+            "enable_safety_checker": True
+        }
+
+        stub_url = os.getenv('FAL_ENDPOINT_URL')
+        with metrics.timer('fal_render'):
+            if stub_url:
+                async with httpx.AsyncClient(timeout=120) as http:
+                    response = await http.post(stub_url, json=arguments)
+                    response.raise_for_status()
+                    return response.json()
+
+            # Updated Janus API call using fal_client (imported on first render)
+            import fal_client
+            return await fal_client.subscribe_async(
+                "fal-ai/janus",
+                arguments=arguments,
+                with_logs=True
+            )
+
 # Initialize image generator
 image_generator = OrcaImageGenerator()
 
+class PromptPool:
+    """Background-refilled pool of expanded prompts for /generate without a prompt.
+
+    New prompts are checked against recently issued ones with the same
+    near-duplicate index used for tweets, so the pool does not fill with
+    rewordings of one idea.
+    """
+    def __init__(self, target_size=6, similarity_threshold=0.5, history_size=200, max_attempts=3):
+        self.target_size = target_size
+        self.max_attempts = max_attempts
+        self.prompts = deque()
+        self.recent = NearDuplicateIndex(threshold=similarity_threshold, capacity=history_size)
+        self.refilling = False
+        # The event loop only holds weak references to tasks
+        self.refill_task = None
+        self.stats = {'hits': 0, 'misses': 0, 'refills': 0, 'rejected': 0, 'last_refill_latency': 0.0, 'total_refill_latency': 0.0}
+
+    def take(self):
+        """Pop a ready prompt (None if empty) and schedule a background top-up."""
+        prompt = self.prompts.popleft() if self.prompts else None
+        self.stats['hits' if prompt else 'misses'] += 1
+        if len(self.prompts) < self.target_size and not self.refilling:
+            self.refill_task = asyncio.create_task(self.refill())
+        return prompt
+
+    async def refill(self, context=None):
+        if self.refilling:
+            return
+        self.refilling = True
+        try:
+            attempts = 0
+            while len(self.prompts) < self.target_size and attempts < self.max_attempts * self.target_size:
+                attempts += 1
+                start = time.monotonic()
+                prompt = await image_generator.expand_prompt()
+                latency = time.monotonic() - start
+                self.stats['refills'] += 1
+                self.stats['last_refill_latency'] = latency
+                self.stats['total_refill_latency'] += latency
+
+                if not prompt or self.recent.is_duplicate(prompt):
+                    self.stats['rejected'] += 1
+                    continue
+                self.recent.add(prompt)
+                self.prompts.append(prompt)
+
+            logging.info(
+                f"Prompt pool depth {len(self.prompts)}/{self.target_size}, "
+                f"avg refill latency {self.stats['total_refill_latency'] / max(self.stats['refills'], 1):.2f}s"
+            )
+        except Exception as e:
+            logging.error(f"Error refilling prompt pool: {e}")
+        finally:
+            self.refilling = False
+
+prompt_pool = PromptPool(target_size=int(os.getenv('IMAGE_PROMPT_POOL_SIZE', 6)))
+
+class ImageCache:
+    """Maps normalized prompts to rendered images stored as content-addressed local files.
+
+    Blobs are named by their SHA-256 and evicted least-recently-used once the
+    directory exceeds max_bytes. The Telegram file_id of each blob is kept so
+    repeat sends reference the already-uploaded photo. Once `auto_variety`
+    auto-prompted renders exist, an empty /generate reuses one of the most
+    recent `auto_variety` with probability `auto_reuse` and renders a fresh
+    pooled prompt otherwise, so the rotation keeps moving.
+    """
+    def __init__(self, directory="image_cache", max_bytes=200 * 1024 * 1024, auto_variety=8, auto_reuse=0.5):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.auto_variety = auto_variety
+        self.auto_reuse = auto_reuse
+        self.conn = sqlite3.connect(self.directory / "index.db", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                file_id TEXT,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prompts (
+                key TEXT PRIMARY KEY,
+                prompt TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                auto INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS prompts_auto ON prompts (auto)")
+        self.conn.commit()
+
+    def blob_path(self, sha):
+        return self.directory / sha[:2] / f"{sha}.img"
+
+    async def lookup(self, prompt):
+        """Return a cached {'prompt', 'photo', 'sha'} for the prompt, or None."""
+        if prompt:
+            row = self.conn.execute(
+                "SELECT p.prompt, p.sha, b.file_id FROM prompts p JOIN blobs b ON b.sha = p.sha WHERE p.key = ?",
+                (normalize_prompt(prompt),)
+            ).fetchone()
+        else:
+            if random.random() >= self.auto_reuse:
+                return None
+            # Newest renders first (INSERT OR REPLACE assigns a fresh rowid)
+            rows = self.conn.execute(
+                "SELECT p.prompt, p.sha, b.file_id FROM prompts p JOIN blobs b ON b.sha = p.sha "
+                "WHERE p.auto = 1 ORDER BY p.rowid DESC LIMIT ?", (self.auto_variety,)
+            ).fetchall()
+            if len(rows) < self.auto_variety:
+                return None
+            row = random.choice(rows)
+        if row is None:
+            return None
+
+        cached_prompt, sha, file_id = row
+        if not file_id:
+            # Read like store writes, off the event loop
+            try:
+                file_id = await asyncio.to_thread(self.blob_path(sha).read_bytes)
+            except FileNotFoundError:
+                self.forget(sha)
+                return None
+        self.conn.execute("UPDATE blobs SET accessed_at = ? WHERE sha = ?", (time.time(), sha))
+        self.conn.commit()
+        logging.info(f"Image cache hit for prompt: {cached_prompt[:60]}")
+        return {"prompt": cached_prompt, "photo": file_id, "sha": sha}
+
+    async def store(self, requested_prompt, result):
+        """Download a fresh render and cache it; falls back to the remote URL on failure."""
+        try:
+            async with httpx.AsyncClient(timeout=60) as http:
+                response = await http.get(result["image_url"])
+                response.raise_for_status()
+                data = response.content
+        except Exception as e:
+            logging.error(f"Error downloading rendered image: {e}")
+            return {"prompt": result["prompt"], "photo": result["image_url"], "sha": None}
+
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            await asyncio.to_thread(path.write_bytes, data)
+
+        self.conn.execute(
+            "INSERT INTO blobs (sha, size, accessed_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(sha) DO UPDATE SET accessed_at = excluded.accessed_at",
+            (sha, len(data), time.time())
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO prompts (key, prompt, sha, auto) VALUES (?, ?, ?, ?)",
+            (normalize_prompt(requested_prompt or result["prompt"]), result["prompt"], sha, 0 if requested_prompt else 1)
+        )
+        self.conn.commit()
+        self.evict()
+
+        # Identical bytes may already be on Telegram's servers
+        row = self.conn.execute("SELECT file_id FROM blobs WHERE sha = ?", (sha,)).fetchone()
+        photo = row[0] if row and row[0] else data
+        return {"prompt": result["prompt"], "photo": photo, "sha": sha}
+
+    def set_file_id(self, sha, file_id):
+        self.conn.execute("UPDATE blobs SET file_id = ? WHERE sha = ?", (file_id, sha))
+        self.conn.commit()
+
+    def forget(self, sha):
+        self.conn.execute("DELETE FROM prompts WHERE sha = ?", (sha,))
+        self.conn.execute("DELETE FROM blobs WHERE sha = ?", (sha,))
+        self.conn.commit()
+        self.blob_path(sha).unlink(missing_ok=True)
+
+    def evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for sha, size in self.conn.execute("SELECT sha, size FROM blobs ORDER BY accessed_at").fetchall():
+            self.forget(sha)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+# Opened on first render so importing the bot creates no directories or databases
+image_cache = None
+
+def get_image_cache():
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageCache(
+            os.getenv('ORCA_IMAGE_CACHE_DIR', 'image_cache'),
+            max_bytes=int(os.getenv('ORCA_IMAGE_CACHE_MB', 200)) * 1024 * 1024,
+            auto_reuse=float(os.getenv('ORCA_IMAGE_AUTO_REUSE', 0.5))
+        )
+    return image_cache
+
+class ImageJob:
+    def __init__(self, bot, user_id, chat_id, prompt, status_message):
+        self.bot = bot
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.prompt = prompt
+        self.status_message = status_message
+        self.position = None
+        self.cancelled = False
+        self.task = None
+
+class ImageJobQueue:
+    """Bounded queue of /generate requests rendered by a fixed pool of workers.
+
+    Each user may hold at most `per_user` queued or running jobs. Waiting
+    users see their queue position in the status message, and /cancel drops
+    a queued job or interrupts a running one.
+    """
+    def __init__(self, workers=2, max_pending=20, per_user=1):
+        self.worker_count = workers
+        self.max_pending = max_pending
+        self.per_user = per_user
+        self.pending = deque()
+        self.reserved = 0  # accepted jobs still waiting for their status message
+        self.active = {}  # user_id -> list of queued or running jobs
+        self.wakeup = asyncio.Queue()
+        self.workers = []
+
+    def ensure_workers(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self.worker()) for _ in range(self.worker_count)]
+
+    async def submit(self, bot, user_id, chat_id, prompt, reply):
+        """Queue a job; `reply` sends the status message. Returns False when rejected."""
+        self.ensure_workers()
+        if len(self.active.get(user_id, [])) >= self.per_user:
+            await reply("⏳ You already have an image in progress. Use /cancel to drop it.")
+            return False
+        if len(self.pending) + self.reserved >= self.max_pending:
+            await reply("🌊 The image queue is full right now. Please try again in a few minutes.")
+            return False
+
+        # Hold the user's and the queue's slot while the status message is sent,
+        # so concurrent /generate calls cannot both pass the checks above
+        job = ImageJob(bot, user_id, chat_id, prompt, None)
+        self.active.setdefault(user_id, []).append(job)
+        self.reserved += 1
+        try:
+            job.status_message = await reply(f"🎨 Queued image... Position {len(self.pending) + 1}.")
+        except Exception:
+            self.finish(job)
+            raise
+        finally:
+            self.reserved -= 1
+        if job.cancelled:
+            return False
+
+        job.position = len(self.pending) + 1
+        self.pending.append(job)
+        self.wakeup.put_nowait(None)
+        return True
+
+    async def cancel(self, user_id):
+        """Cancel the user's jobs; returns how many were cancelled."""
+        jobs = self.active.pop(user_id, [])
+        for job in jobs:
+            job.cancelled = True
+            if job in self.pending:
+                self.pending.remove(job)
+            if job.task:
+                job.task.cancel()
+            if job.status_message is None:
+                # Cancelled before its status message went out; submit drops it
+                continue
+            try:
+                await job.status_message.edit_text("🛑 Image generation cancelled.")
+            except Exception as e:
+                logging.error(f"Error updating cancelled image job: {e}")
+        if jobs:
+            await self.update_positions()
+        return len(jobs)
+
+    async def update_positions(self):
+        for index, job in enumerate(list(self.pending), start=1):
+            if job.position == index:
+                continue
+            job.position = index
+            try:
+                await job.status_message.edit_text(f"🎨 Queued image... Position {index}.")
+            except Exception as e:
+                logging.error(f"Error updating image queue position: {e}")
+
+    def finish(self, job):
+        jobs = self.active.get(job.user_id, [])
+        if job in jobs:
+            jobs.remove(job)
+        if not jobs:
+            self.active.pop(job.user_id, None)
+
+    async def render(self, prompt):
+        """Serve a cached image for the prompt, or render and cache a new one."""
+        cached = await get_image_cache().lookup(prompt)
+        if cached:
+            return cached
+        result = await image_generator.generate_image(prompt)
+        if not result:
+            return None
+        return await get_image_cache().store(prompt, result)
+
+    async def worker(self):
+        while True:
+            await self.wakeup.get()
+            if not self.pending:
+                continue
+            job = self.pending.popleft()
+            await self.update_positions()
+            if job.cancelled:
+                continue
+
+            try:
+                await job.status_message.edit_text("🎨 Generating image... Please wait.")
+                if job.cancelled:
+                    continue
+                job.task = asyncio.create_task(self.render(job.prompt))
+                result = await job.task
+
+                if result:
+                    # Send image and prompt
+                    caption = f"🖼️ Generated image:\n\n📝 Prompt: {result['prompt']}"
+                    await job.bot.delete_message(
+                        chat_id=job.chat_id,
+                        message_id=job.status_message.message_id
+                    )
+                    message = await job.bot.send_photo(
+                        chat_id=job.chat_id,
+                        photo=result["photo"],
+                        caption=caption
+                    )
+                    # Remember Telegram's copy so the next hit needs no re-upload
+                    if result["sha"] and not isinstance(result["photo"], str) and message and message.photo:
+                        get_image_cache().set_file_id(result["sha"], message.photo[-1].file_id)
+                else:
+                    await job.status_message.edit_text("❌ Failed to generate image. Please try again.")
+            except asyncio.CancelledError:
+                # Only the job's render task was cancelled; keep the worker alive
+                if not job.cancelled:
+                    raise
+            except Exception as e:
+                logging.error(f"Error in image job for user {job.user_id}: {e}")
+            finally:
+                self.finish(job)
+
+image_jobs = ImageJobQueue(
+    workers=int(os.getenv('IMAGE_WORKERS', 2)),
+    max_pending=int(os.getenv('IMAGE_QUEUE_SIZE', 20)),
+    per_user=int(os.getenv('IMAGE_JOBS_PER_USER', 1))
+)
+
+@metrics.timed('telegram_handler', handler='generate')
 async def generate_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Generate an image using Janus"""
     try:
@@ -799,34 +1826,86 @@ async def generate_image_command(update: Update, context: ContextTypes.DEFAULT_T
         message_text = update.message.text
         prompt = message_text.replace('/generate', '').strip() if message_text else None
         
-        # Send initial status
-        status_message = await update.message.reply_text("🎨 Generating image... Please wait.")
-        
-        # Generate image
-        result = await image_generator.generate_image(prompt)
-        
-        if result:
-            # Send image and prompt
-            caption = f"🖼️ Generated image:\n\n📝 Prompt: {result['prompt']}"
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=status_message.message_id
-            )
-            await context.bot.send_photo(
-                chat_id=update.effective_chat.id,
-                photo=result["image_url"],
-                caption=caption
-            )
-        else:
-            await status_message.edit_text("❌ Failed to generate image. Please try again.")
+        # Rendering happens on the job queue's workers, not in this handler
+        await image_jobs.submit(
+            context.bot,
+            update.effective_user.id,
+            update.effective_chat.id,
+            prompt,
+            update.message.reply_text
+        )
             
     except Exception as e:
         logging.error(f"Error in generate_image_command: {e}")
         await update.message.reply_text("❌ An error occurred while generating the image.")
 
+async def cancel_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel the user's queued or running image generation"""
+    cancelled = await image_jobs.cancel(update.effective_user.id)
+    if not cancelled:
+        await update.message.reply_text("No image generation to cancel.")
+
+# Telegram user IDs allowed to run admin commands such as /memsnapshot
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ORCA_ADMIN_IDS', '').split(',') if user_id.strip()}
+
+async def memory_snapshot_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Reply with the top allocation sites (admins only)"""
+    if not update.effective_user or update.effective_user.id not in ADMIN_IDS:
+        return
+    await update.message.reply_text("\n".join(memory_snapshot()))
+
+def register_metrics():
+    """Expose queue depths and hit rates alongside the call timings."""
+    metrics.gauge('completion_cache', completion_cache.stats)
+    metrics.gauge('admission', lambda: admission.stats)
+    metrics.gauge('intent_router', intent_router.stats)
+    metrics.gauge('reply_pending', lambda: admission.pending)
+    metrics.gauge('content_buffer_depth', lambda: {kind: len(items) for kind, items in get_content_buffer().items.items()})
+    metrics.gauge('prompt_pool_depth', lambda: len(prompt_pool.prompts))
+    metrics.gauge('prompt_pool', lambda: prompt_pool.stats)
+    metrics.gauge('image_queue_depth', lambda: len(image_jobs.pending))
+    metrics.gauge('known_chats', lambda: len(consciousness.chats()))
+
+# Handlers only act on new messages (text, commands and new chat members)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+def build_application():
+    """Build the Application, optionally against a self-hosted or fake Bot API server."""
+    builder = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN'))
+    base_url = os.getenv('TELEGRAM_BASE_URL')
+    if base_url:
+        builder = builder.base_url(base_url).base_file_url(os.getenv('TELEGRAM_BASE_FILE_URL', base_url))
+    builder = builder.concurrent_updates(int(os.getenv('TELEGRAM_CONCURRENT_UPDATES', 64)))
+    return builder.build()
+
+def run_application(app):
+    """Receive updates through a webhook when TELEGRAM_WEBHOOK_URL is set, else long polling."""
+    webhook_url = os.getenv('TELEGRAM_WEBHOOK_URL')
+    if not webhook_url:
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
+        return
+
+    url_path = os.getenv('TELEGRAM_WEBHOOK_PATH', 'telegram')
+    logging.info(f"Receiving updates via webhook at {webhook_url.rstrip('/')}/{url_path}")
+    app.run_webhook(
+        listen=os.getenv('TELEGRAM_WEBHOOK_LISTEN', '0.0.0.0'),
+        port=int(os.getenv('TELEGRAM_WEBHOOK_PORT', 8443)),
+        url_path=url_path,
+        webhook_url=f"{webhook_url.rstrip('/')}/{url_path}",
+        secret_token=os.getenv('TELEGRAM_WEBHOOK_SECRET'),
+        max_connections=int(os.getenv('TELEGRAM_WEBHOOK_MAX_CONNECTIONS', 40)),
+        allowed_updates=ALLOWED_UPDATES
+    )
+
 def main():
     """Start the bot."""
-    app = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN')).build()
+    app = build_application()
+
+    # SIGUSR1 logs a tracemalloc snapshot; /metrics is served when ORCA_METRICS=1
+    install_snapshot_signal()
+    if metrics.enabled:
+        register_metrics()
+        start_http_server(int(os.getenv('ORCA_METRICS_PORT', 9108)))
     
     # Initialize X integration
     x_integration = XIntegration(app.bot)
@@ -853,17 +1932,29 @@ def main():
         first=10.0
     )
 
+    # Keep ready-to-post tweets buffered
+    app.job_queue.run_repeating(
+        get_content_buffer().refill,
+        interval=int(os.getenv('ORCA_CONTENT_REFILL_INTERVAL', 300)),
+        first=1.0
+    )
+
+    # Keep expanded prompts ready for /generate without a prompt
+    app.job_queue.run_repeating(prompt_pool.refill, interval=600, first=5.0)
+
     # Add image generation command
     app.add_handler(CommandHandler("generate", generate_image_command))
+    app.add_handler(CommandHandler("cancel", cancel_image_command))
+    app.add_handler(CommandHandler("memsnapshot", memory_snapshot_command))
 
-    logging.info("Starting bot... Tweet frequency: ~57 tweets per day (every 25 minutes)")
+    logging.info(f"Starting bot... Tweet check every 25 minutes, capped at {x_integration.daily_limit} tweets per day")
     
     # Add detailed logging for job scheduling
     next_run = datetime.now() + timedelta(seconds=10)
     logging.info(f"First tweet scheduled for: {next_run}")
     logging.info(f"Subsequent tweets will run every 25 minutes")
     
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    run_application(app)
 
 if __name__ == '__main__':
     try:
@@ -877,39 +1968,18 @@ async def post_tweet():
     """Post a tweet every 30 minutes"""
     try:
         logging.info("Starting tweet generation...")
+        twitter_client = get_twitter_client()
         if twitter_client:
             message = await orca.generate_tweet()
             if message:
                 # Final cleanup
                 message = message.strip()
                 if message:
-                    tweet = twitter_client.create_tweet(text=message)
+                    tweet = await asyncio.to_thread(twitter_client.create_tweet, text=message)
                     logging.info(f"Tweet posted successfully: {tweet.data['id']}")
     except Exception as e:
         logging.error(f"Error posting tweet: {e}")
 
 def clean_tweet_text(text):
     """Clean tweet text before posting"""
-    # Remove common patterns
-    patterns = [
-        "Did you know",
-        "Just like",
-        "dive into",
-        "making waves",
-        "swimming through",
-        "*click* *click*",
-        "🐋", "🌊", "🎶", "✨",
-        "#AI", "#OceanIntelligence", "#OceanFacts"
-    ]
-    
-    cleaned_text = text
-    for pattern in patterns:
-        cleaned_text = cleaned_text.replace(pattern, "")
-    
-    # Remove all hashtags
-    cleaned_text = ' '.join(word for word in cleaned_text.split() if not word.startswith('#'))
-    
-    # Remove all emojis
-    cleaned_text = ' '.join(word for word in cleaned_text.split() if not any(char in word for char in ['🐋', '🌊', '🎶', '✨', '🐳', '🔬', '🤖', '💡']))
-    
-    return cleaned_text.strip()
\ No newline at end of file
+    return sanitizers['legacy'].clean(text)
\ No newline at end of file